@@ -0,0 +1,159 @@
+import asyncio
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Set, Union
+
+import aiofiles
+
+from bot.api.parser import Parser
+from bot.api.title_index import TitleIndex
+from bot.colors import green, red
+from bot.constants import CATALOG_MISS_TTL, CATALOG_PAGE_SIZE, CATALOG_REFRESH_INTERVAL, CATALOG_SNAPSHOT
+
+challenge_type = Dict[str, Any]
+detail_fields = ('titre', 'score', 'rubrique', 'difficulte')
+
+
+class ChallengeCatalog:
+
+    def __init__(self, snapshot_filename: str = CATALOG_SNAPSHOT):
+        """ In-memory RootMe challenge metadata indexed by id_challenge """
+        self.challenges: Dict[str, challenge_type] = {}
+        self.titles = TitleIndex()
+        self.snapshot_filename = snapshot_filename
+        self.dirty = False  # catalog changed since last snapshot
+        self.listed: Set[str] = set()  # ids seen while walking /challenges pages
+        self.listed_order: List[str] = []  # same ids by discovery order, position + 1 is the catalog version
+        self.tail_offset = 0  # debut_challenges of the last page of /challenges
+        self.polled = False  # a first full walk of the pages has been done
+        self.misses: Dict[str, float] = {}  # id_challenge -> time details could not be fetched (premium, removed)
+
+    def __len__(self) -> int:
+        return len(self.challenges)
+
+    def __contains__(self, id_challenge: Union[int, str]) -> bool:
+        return str(id_challenge) in self.challenges
+
+    def ids(self) -> Set[str]:
+        return set(self.challenges.keys())
+
+    def add(self, challenge: challenge_type) -> bool:
+        """ Merge challenge data into the catalog, return True if the challenge was unknown """
+        id_challenge = str(challenge['id_challenge'])
+        if 'titre' in challenge:
+            self.titles.add(id_challenge, challenge['titre'])
+        known = self.challenges.get(id_challenge)
+        if known is None:
+            self.challenges[id_challenge] = dict(challenge, id_challenge=id_challenge)
+            self.dirty = True
+            return True
+        update = {key: value for key, value in challenge.items() if key != 'id_challenge' and known.get(key) != value}
+        if update:
+            known.update(update)
+            self.dirty = True
+        return False
+
+    def load(self, challenges: List[challenge_type]) -> List[challenge_type]:
+        self.misses = {}  # catalog refreshed, failed ids may be fetched again
+        return [challenge for challenge in challenges if self.add(challenge)]
+
+    @property
+    def version(self) -> int:
+        return len(self.listed_order)
+
+    def listed_since(self, version: int) -> List[challenge_type]:
+        """ Challenges listed after a given catalog version, in discovery order """
+        return [self.challenges[id_challenge] for id_challenge in self.listed_order[version:]]
+
+    def get_cached(self, id_challenge: Union[int, str]) -> Optional[challenge_type]:
+        return self.challenges.get(str(id_challenge))
+
+    def search(self, query: str) -> List[challenge_type]:
+        """ Challenges whose title matches query; an exact title match wins over fuzzy ones """
+        ids = self.titles.exact(query) or self.titles.search(query)
+        return [self.challenges[id_challenge] for id_challenge in ids]
+
+    async def get(self, id_challenge: Union[int, str]) -> Optional[challenge_type]:
+        """ Serve challenge details from memory, fetch them once if they are not known yet """
+        challenge = self.get_cached(id_challenge)
+        if challenge is not None and all(field in challenge for field in detail_fields):
+            return challenge
+        missed_at = self.misses.get(str(id_challenge))
+        if missed_at is not None and time.monotonic() - missed_at < CATALOG_MISS_TTL:
+            return None
+        challenge_info = await Parser.extract_challenge_info(id_challenge)
+        if challenge_info is None:
+            self.misses[str(id_challenge)] = time.monotonic()
+            return None
+        self.misses.pop(str(id_challenge), None)
+        self.add(dict(challenge_info, id_challenge=id_challenge))
+        return self.get_cached(id_challenge)
+
+    def load_snapshot(self) -> bool:
+        """ Fill the catalog from the local snapshot, return False if there is none """
+        try:
+            with open(self.snapshot_filename, 'r') as f:
+                challenges = json.load(f)
+        except (OSError, ValueError):
+            return False
+        self.load(challenges)
+        self.dirty = False
+        return len(self) > 0
+
+    async def save_snapshot(self) -> None:
+        """ Write the catalog to a temporary file then rename it, a crash never leaves a partial snapshot """
+        content = json.dumps(sorted(self.challenges.values(), key=lambda x: int(x['id_challenge'])))
+        tmp_filename = f'{self.snapshot_filename}.tmp'
+        async with aiofiles.open(tmp_filename, mode='w') as f:
+            await f.write(content)
+        os.replace(tmp_filename, self.snapshot_filename)
+        self.dirty = False
+
+    async def poll(self) -> List[challenge_type]:
+        """ Walk /challenges pages from the last known one, return challenges listed for the first time
+
+        The first call walks every page to build the list of known ids, later calls only fetch the tail page
+        and the following ones when the challenge count grows.
+        """
+        new_challenges = []
+        offset = self.tail_offset
+        while True:
+            page = await Parser.extract_challenges_by_page(offset)
+            if page is None:
+                return []  # retry from the same page next time
+            challenges = list(page[0].values())
+            if not challenges and offset > 0:  # challenges were removed, tail page moved backwards
+                offset -= CATALOG_PAGE_SIZE
+                continue
+            for challenge in challenges:
+                self.add(challenge)
+                if str(challenge['id_challenge']) not in self.listed:
+                    self.listed.add(str(challenge['id_challenge']))
+                    self.listed_order.append(str(challenge['id_challenge']))
+                    new_challenges.append(challenge)
+            self.tail_offset = offset
+            if page[-1].get('rel') != 'next':
+                break
+            offset += CATALOG_PAGE_SIZE
+        if not self.polled:  # everything is new on the first walk
+            self.polled = True
+            green(f'Challenge catalog polled ({len(self.listed)} challenges listed)')
+            return []
+        if new_challenges:
+            green(f'{len(new_challenges)} new challenge(s) added to catalog ({len(self.listed)} challenges listed)')
+        return new_challenges
+
+    async def poll_forever(self, interval: int = CATALOG_REFRESH_INTERVAL) -> None:
+        """ Single global poller, guilds read new challenges from the catalog """
+        while True:
+            try:
+                await self.poll()
+                if self.dirty:
+                    await self.save_snapshot()
+            except Exception as exception:  # keep the background task alive
+                red(f'Cannot poll challenge catalog: {exception}')
+            await asyncio.sleep(interval)
+
+
+catalog = ChallengeCatalog()
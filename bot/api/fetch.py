@@ -1,8 +1,12 @@
 import re
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 
+from bot.api.mirror import mirror
 from bot.api.parser import Parser, response_profile_complete
+from bot.api.scheduler import poll_scheduler
+from bot.api.solve_matrix import solve_matrix
 from bot.colors import red
+from bot.concurrency import map_concurrently
 from bot.constants import LANGS
 
 
@@ -61,30 +65,37 @@ async def get_challenges(lang: str):
     return await Parser.extract_challenges(lang)
 
 
-async def get_all_challenges():
-    result = []
-    page_num = -50
-    result_by_page = [{}, {"rel":"next", "href":"..."}]
-    while result_by_page[-1]['rel'] == 'next':
-        page_num += 50
-        result_by_page = await Parser.extract_challenges_by_page(page_num)
-        result += list(result_by_page[0].values())
-    return result
+async def poll_users(id_users: Iterable[int]) -> None:
+    """ Fetch each tracked RootMe account once and store it in the mirror, guilds read it from there """
+    async def poll_user(id_user: int) -> None:
+        user_data = await Parser.extract_rootme_profile_complete(id_user)
+        if user_data is None:  # score is equal to zero or API error, keep what is mirrored
+            poll_scheduler.reschedule(id_user, solved=False)
+            return
+        known = id_user in mirror.profiles
+        new_validations = mirror.update(id_user, user_data)
+        poll_scheduler.reschedule(id_user, solved=known and len(new_validations) > 0)
+
+    await map_concurrently(poll_user, id_users)
 
 
 async def get_solved_challenges(id_user: int) -> Optional[response_profile_complete]:
-    solved_challenges_data = await Parser.extract_rootme_profile_complete(id_user)
+    solved_challenges_data = await mirror.get(id_user)
     if solved_challenges_data is None:
         red(f'Error trying to fetch solved challenges.')
         return None
     return solved_challenges_data['validations']
 
 
-def get_diff(solved_user1, solved_user2):
-    if solved_user1 == solved_user2:
-        return None, None
-    test1 = list(map(lambda x: x['id_challenge'], solved_user1))
-    test2 = list(map(lambda x: x['id_challenge'], solved_user2))
-    user1_diff = list(filter(lambda x: x['id_challenge'] not in test2, solved_user1))[::-1]
-    user2_diff = list(filter(lambda x: x['id_challenge'] not in test1, solved_user2))[::-1]
-    return user1_diff, user2_diff
+def solves_by_date(id_user: int, bitset: int) -> List[Dict[str, str]]:
+    """ Challenges of a solve matrix bitset with their solve date, newest first """
+    dates = mirror.solved.get(int(id_user), {})
+    solves = [dict(id_challenge=id_challenge, date=dates.get(id_challenge, '')) for id_challenge in
+              solve_matrix.ids(bitset)]
+    return sorted(solves, key=lambda x: x['date'], reverse=True)
+
+
+def get_diff(id_user1: int, id_user2: int) -> Tuple[List[Dict[str, str]], List[Dict[str, str]]]:
+    """ Challenges solved only by user1 and only by user2, both empty when they solved the same ones """
+    user1_diff, user2_diff = solve_matrix.diff(id_user1, id_user2)
+    return solves_by_date(id_user1, user1_diff), solves_by_date(id_user2, user2_diff)
@@ -0,0 +1,47 @@
+import time
+from typing import Any, Dict, List, Optional
+
+from bot.api.parser import Parser, response_profile_complete
+from bot.api.solve_matrix import solve_matrix
+from bot.constants import MIRROR_MAX_AGE
+
+
+class ValidationMirror:
+
+    def __init__(self, max_age: int = MIRROR_MAX_AGE):
+        """ Local copy of the /auteurs/{id} profiles of tracked users, kept up to date by the cron loop """
+        self.max_age = max_age
+        self.profiles: Dict[int, response_profile_complete] = {}  # None when the user has no score yet
+        self.solved: Dict[int, Dict[str, str]] = {}  # rootme_user_id -> id_challenge -> solve date
+        self.fetched_at: Dict[int, float] = {}
+
+    def update(self, id_user: int, user_data: response_profile_complete) -> List[Dict[str, Any]]:
+        """ Store a freshly fetched profile, return validations that were not mirrored yet """
+        id_user = int(id_user)
+        self.profiles[id_user] = user_data
+        self.fetched_at[id_user] = time.monotonic()
+        previous = self.solved.get(id_user, {})
+        validations = [] if user_data is None else user_data['validations']
+        # rebuilt from the profile so validations removed by RootMe disappear too
+        self.solved[id_user] = {str(validation['id_challenge']): validation['date'] for validation in validations}
+        solve_matrix.set_solves(id_user, self.solved[id_user])
+        return [validation for validation in validations if str(validation['id_challenge']) not in previous]
+
+    def is_fresh(self, id_user: int, max_age: Optional[int] = None) -> bool:
+        max_age = self.max_age if max_age is None else max_age
+        fetched_at = self.fetched_at.get(int(id_user))
+        return fetched_at is not None and time.monotonic() - fetched_at <= max_age
+
+    async def get(self, id_user: int, max_age: Optional[int] = None) -> response_profile_complete:
+        """ Mirrored profile, only fetched from the API when missing or older than max_age """
+        id_user = int(id_user)
+        if self.is_fresh(id_user, max_age):
+            return self.profiles[id_user]
+        user_data = await Parser.extract_rootme_profile_complete(id_user)
+        if user_data is None and id_user in self.profiles:  # API error, stale data is better than nothing
+            return self.profiles[id_user]
+        self.update(id_user, user_data)
+        return user_data
+
+
+mirror = ValidationMirror()
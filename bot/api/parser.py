@@ -10,8 +10,11 @@ import aiohttp.client_reqrep
 from dotenv import load_dotenv
 import asyncio
 
+from bot.api.rate_limit import backoff_delay, parse_retry_after, rate_limiter
+from bot.api.session import session_manager
+from bot.api.single_flight import SingleFlight
 from bot.colors import red, purple, yellow
-from bot.constants import URL, timeout
+from bot.constants import MAX_RETRIES, URL, timeout
 
 load_dotenv()
 response_profile = Optional[List[Dict[str, Any]]]
@@ -23,11 +26,41 @@ ROOTME_API_KEY = environ.get('ROOTME_API_KEY')
 
 cookie_jar = aiohttp.CookieJar()
 cookie_jar.update_cookies({"api_key": ROOTME_API_KEY})
+session_manager.set_cookie_jar(cookie_jar)
+single_flight = SingleFlight()  # coalesces identical in-flight requests
+
+
+class RootMeAPIError(Exception):
+
+    def __init__(self, url: str, reason: str):
+        self.url = url
+        self.reason = reason
+        super().__init__(f'{url} -> {reason}')
+
+
+transient_errors = (asyncio.TimeoutError, aiohttp.ClientConnectionError)
+
+
+async def wait_before_retry(url: str, attempt: int, reason: str, delay: Optional[float] = None,
+                            throttled: bool = False) -> None:
+    """ Back off before retrying url, the whole rate limiter is paused only when the API throttles us (429) """
+    if attempt + 1 >= MAX_RETRIES:  # no retry left, do not wait for nothing
+        return
+    if delay is None:
+        delay = backoff_delay(attempt)
+    yellow(f'{url} -> {reason}, retrying in {delay:.1f}s ({attempt + 1}/{MAX_RETRIES})')
+    if throttled:
+        rate_limiter.pause(delay)
+    else:  # only this request failed, other callers keep their tokens
+        await asyncio.sleep(delay)
+    await rate_limiter.acquire()
+
 
 async def get_cookies():
-    async with aiohttp.ClientSession(cookie_jar=cookie_jar) as session:
-        await asyncio.sleep(1)
-        data = dict(login=ROOTME_ACCOUNT_LOGIN, password=ROOTME_ACCOUNT_PASSWORD)
+    session = await session_manager.get()
+    data = dict(login=ROOTME_ACCOUNT_LOGIN, password=ROOTME_ACCOUNT_PASSWORD)
+    await rate_limiter.acquire()
+    for attempt in range(MAX_RETRIES):
         try:
             async with session.post(f'{URL}/login', data=data, timeout=timeout) as response:
                 print(response)
@@ -35,28 +68,36 @@ async def get_cookies():
                     content = await response.json(content_type=None)
                     return "Logged in"
                 elif response.status == 429:   # Too Many requests
-                    return await get_cookies()
+                    delay = parse_retry_after(response.headers.get('Retry-After'))
+                    await wait_before_retry(f'{URL}/login', attempt, 'too many requests', delay, throttled=True)
+                    continue
                 red('Wrong credentials.')
                 sys.exit(0)
-        except asyncio.TimeoutError:
-            return await get_cookies()
+        except transient_errors:
+            await wait_before_retry(f'{URL}/login', attempt, 'network error')
+    raise RootMeAPIError(f'{URL}/login', 'retry budget exhausted')
 
 
 async def get_status():
-    await asyncio.sleep(1)
-    async with aiohttp.ClientSession(cookie_jar=cookie_jar) as session:
+    session = await session_manager.get()
+    await rate_limiter.acquire()
+    for attempt in range(MAX_RETRIES):
         try:
             async with session.get(f'{URL}/challenges', timeout=timeout) as response:
                 if response.status == 429:
-                    return await get_status()
+                    delay = parse_retry_after(response.headers.get('Retry-After'))
+                    await wait_before_retry(f'{URL}/challenges', attempt, 'too many requests', delay, throttled=True)
+                    continue
                 return response.status
-        except asyncio.TimeoutError:
-            return await get_status()
+        except transient_errors:
+            await wait_before_retry(f'{URL}/challenges', attempt, 'network error')
+    raise RootMeAPIError(f'{URL}/challenges', 'retry budget exhausted')
 
 
 async def request_to(url: str) -> response_profile:
-    await asyncio.sleep(1)
-    async with aiohttp.ClientSession(cookie_jar=cookie_jar) as session:
+    session = await session_manager.get()
+    await rate_limiter.acquire()
+    for attempt in range(MAX_RETRIES):
         try:
             async with session.get(url, timeout=timeout) as response:
                 print(response)
@@ -71,22 +112,34 @@ async def request_to(url: str) -> response_profile:
                         purple(f'{url} -> probably a premium challenge')
                         return None
                     await get_cookies()
-                    return await request_to(url)
+                    await rate_limiter.acquire()
+                    continue
                 elif response.status == 429:   # Too Many requests
-                    return await request_to(url)
+                    delay = parse_retry_after(response.headers.get('Retry-After'))
+                    await wait_before_retry(url, attempt, 'too many requests', delay, throttled=True)
+                    continue
                 else:
                     return None
-        except asyncio.TimeoutError:
-                return await request_to(url)
+        except transient_errors:
+            await wait_before_retry(url, attempt, 'network error')
+    raise RootMeAPIError(url, 'retry budget exhausted')
 
 
-async def extract_json(url: str) -> response_profile:
-    data = await request_to(url)
+async def fetch_json(url: str) -> response_profile:
+    try:
+        data = await request_to(url)
+    except RootMeAPIError as exception:
+        red(str(exception))
+        return None
     if data is None:
         red(url)
     return data
 
 
+async def extract_json(url: str) -> response_profile:
+    return await single_flight.do(url, lambda: fetch_json(url))
+
+
 class Parser:
 
     @staticmethod
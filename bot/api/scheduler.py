@@ -0,0 +1,68 @@
+import heapq
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from bot.constants import POLL_BUDGET, POLL_MAX_INTERVAL, POLL_MIN_INTERVAL, POLL_RELAX_FACTOR
+
+
+class PollScheduler:
+
+    def __init__(self, min_interval: float = POLL_MIN_INTERVAL, max_interval: float = POLL_MAX_INTERVAL,
+                 relax_factor: float = POLL_RELAX_FACTOR, budget: int = POLL_BUDGET):
+        """ Priority queue of tracked RootMe accounts keyed by next poll time
+
+        Active players are polled every min_interval seconds, the interval grows by relax_factor each time
+        nothing new is found, up to max_interval. At most `budget` accounts are polled per cron cycle.
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.relax_factor = relax_factor
+        self.budget = budget
+        self.queue: List[Tuple[float, int]] = []  # (due time, rootme_user_id)
+        self.due_at: Dict[int, float] = {}  # current due time, stale queue entries are skipped
+        self.intervals: Dict[int, float] = {}
+
+    def __len__(self) -> int:
+        return len(self.due_at)
+
+    def schedule(self, id_user: int, due_at: float) -> None:
+        self.due_at[id_user] = due_at
+        heapq.heappush(self.queue, (due_at, id_user))
+
+    def sync(self, id_users: Iterable[int]) -> None:
+        """ Track new accounts (due right away) and forget accounts no server tracks anymore """
+        id_users = set(id_users)
+        now = time.monotonic()
+        for id_user in id_users - set(self.due_at):
+            self.intervals[id_user] = self.min_interval
+            self.schedule(id_user, now)
+        for id_user in set(self.due_at) - id_users:
+            del self.due_at[id_user]
+            del self.intervals[id_user]
+
+    def due(self, now: Optional[float] = None) -> List[int]:
+        """ Pop accounts that are due, most overdue first, within the polling budget """
+        now = time.monotonic() if now is None else now
+        id_users = []
+        while self.queue and len(id_users) < self.budget and self.queue[0][0] <= now:
+            due_at, id_user = heapq.heappop(self.queue)
+            if self.due_at.get(id_user) != due_at:  # rescheduled or untracked since
+                continue
+            id_users.append(id_user)
+        for id_user in id_users:  # provisional, so that an account is never lost if its poll fails
+            self.schedule(id_user, now + self.max_interval)
+        return id_users
+
+    def reschedule(self, id_user: int, solved: bool) -> None:
+        """ Tighten the interval after a detected solve, relax it when nothing happened """
+        if id_user not in self.due_at:
+            return
+        if solved:
+            interval = self.min_interval
+        else:
+            interval = min(self.max_interval, self.intervals[id_user] * self.relax_factor)
+        self.intervals[id_user] = interval
+        self.schedule(id_user, time.monotonic() + interval)
+
+
+poll_scheduler = PollScheduler()
@@ -0,0 +1,44 @@
+from typing import Optional
+
+import aiohttp
+
+from bot.colors import green
+from bot.constants import DNS_CACHE_TTL, KEEPALIVE_TIMEOUT, POOL_SIZE, POOL_SIZE_PER_HOST
+
+
+class SessionManager:
+
+    def __init__(self, pool_size: int = POOL_SIZE, pool_size_per_host: int = POOL_SIZE_PER_HOST,
+                 dns_cache_ttl: int = DNS_CACHE_TTL, keepalive_timeout: int = KEEPALIVE_TIMEOUT):
+        """ Long-lived aiohttp session shared by every RootMe API call """
+        self.pool_size = pool_size
+        self.pool_size_per_host = pool_size_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.cookie_jar = None
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def set_cookie_jar(self, cookie_jar: aiohttp.CookieJar) -> None:
+        self.cookie_jar = cookie_jar
+
+    async def start(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, limit_per_host=self.pool_size_per_host,
+                                             use_dns_cache=True, ttl_dns_cache=self.dns_cache_ttl,
+                                             keepalive_timeout=self.keepalive_timeout)
+            self._session = aiohttp.ClientSession(connector=connector, cookie_jar=self.cookie_jar)
+            green(f'HTTP session opened (pool size: {self.pool_size}, DNS cache TTL: {self.dns_cache_ttl}s)')
+        return self._session
+
+    async def get(self) -> aiohttp.ClientSession:
+        """ Session is (re)opened lazily so that it is always bound to the running event loop """
+        return await self.start()
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            green('HTTP session closed')
+        self._session = None
+
+
+session_manager = SessionManager()
@@ -0,0 +1,29 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+from bot.colors import grey
+
+
+class SingleFlight:
+
+    def __init__(self):
+        """ Concurrent callers asking for the same key share one in-flight call """
+        self.inflight: Dict[str, asyncio.Future] = {}
+        self.calls = 0
+        self.saved = 0
+
+    async def do(self, key: str, function: Callable[[], Awaitable[Any]]) -> Any:
+        future = self.inflight.get(key)
+        if future is not None:
+            self.saved += 1
+            grey(f'{key} -> joined in-flight request ({self.saved} calls saved)')
+        else:
+            self.calls += 1
+            future = asyncio.ensure_future(function())
+            self.inflight[key] = future
+            future.add_done_callback(lambda _: self.inflight.pop(key, None))
+        # shield: a cancelled caller must not cancel the request other callers are waiting for
+        return await asyncio.shield(future)
+
+    def stats(self) -> Dict[str, int]:
+        return dict(calls=self.calls, saved=self.saved, inflight=len(self.inflight))
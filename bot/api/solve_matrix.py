@@ -0,0 +1,70 @@
+from typing import Dict, Iterable, List, Tuple, Union
+
+
+class SolveMatrix:
+
+    def __init__(self):
+        """ Users × challenges solve matrix, each user row is a bitset stored in a Python int """
+        self.columns: Dict[str, int] = {}  # id_challenge -> bit position
+        self.challenge_ids: List[str] = []  # bit position -> id_challenge
+        self.rows: Dict[int, int] = {}  # rootme_user_id -> bitset of solved challenges
+
+    def column(self, id_challenge: Union[int, str]) -> int:
+        """ Bit position of a challenge, allocated on first use: only called when storing solves """
+        id_challenge = str(id_challenge)
+        position = self.columns.get(id_challenge)
+        if position is None:
+            position = len(self.challenge_ids)
+            self.columns[id_challenge] = position
+            self.challenge_ids.append(id_challenge)
+        return position
+
+    def mask(self, ids: Iterable[Union[int, str]]) -> int:
+        bitset = 0
+        for id_challenge in ids:
+            bitset |= 1 << self.column(id_challenge)
+        return bitset
+
+    def ids(self, bitset: int) -> List[str]:
+        result = []
+        while bitset:
+            lowest = bitset & -bitset
+            result.append(self.challenge_ids[lowest.bit_length() - 1])
+            bitset ^= lowest
+        return result
+
+    def set_solves(self, id_user: int, ids: Iterable[Union[int, str]]) -> None:
+        """ Replace a user row, challenges no longer listed are cleared """
+        self.rows[int(id_user)] = self.mask(ids)
+
+    def row(self, id_user: int) -> int:
+        return self.rows.get(int(id_user), 0)
+
+    def who_solved(self, id_challenge: Union[int, str], team: Iterable[int]) -> List[int]:
+        """ Team members who solved a challenge, in team order """
+        position = self.columns.get(str(id_challenge))
+        if position is None:  # nobody solved it, do not grow the index for a lookup
+            return []
+        bit = 1 << position
+        return [id_user for id_user in team if self.row(id_user) & bit]
+
+    def diff(self, id_user1: int, id_user2: int) -> Tuple[int, int]:
+        """ Bitsets of challenges solved only by user1 and only by user2 """
+        row1, row2 = self.row(id_user1), self.row(id_user2)
+        return row1 & ~row2, row2 & ~row1
+
+    def diff_with_team(self, id_user: int, team: Iterable[int]) -> Dict[int, int]:
+        """ For each team member, bitset of challenges they solved and id_user did not """
+        row = self.row(id_user)
+        return {id_teammate: self.row(id_teammate) & ~row for id_teammate in team if id_teammate != id_user}
+
+    def unique_solves(self, id_user: int, team: Iterable[int]) -> int:
+        """ Bitset of challenges solved by id_user and nobody else in the team """
+        others = 0
+        for id_teammate in team:
+            if id_teammate != id_user:
+                others |= self.row(id_teammate)
+        return self.row(id_user) & ~others
+
+
+solve_matrix = SolveMatrix()
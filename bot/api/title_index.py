@@ -0,0 +1,98 @@
+import re
+import unicodedata
+from bisect import bisect_left, insort
+from html import unescape
+from typing import Dict, List, Set, Tuple
+
+from bot.constants import TITLE_SEARCH_LIMIT, TITLE_SIMILARITY_THRESHOLD
+
+
+def normalize_title(title: str) -> str:
+    """ Unescape HTML entities, strip accents, casefold and collapse punctuation/whitespace """
+    title = unicodedata.normalize('NFKD', unescape(title))
+    title = ''.join(char for char in title if not unicodedata.combining(char))
+    return ' '.join(re.sub(r'[\W_]+', ' ', title.casefold()).split())
+
+
+def trigrams(normalized: str) -> Set[str]:
+    padded = f'  {normalized} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TitleIndex:
+
+    def __init__(self):
+        """ Local search index over challenge titles (exact, prefix, substring and trigram matches) """
+        self.titles: Dict[str, str] = {}  # id_challenge -> normalized title
+        self.by_title: Dict[str, Set[str]] = {}  # normalized title -> id_challenge
+        self.sorted_titles: List[str] = []  # normalized titles, for prefix lookups
+        self.by_trigram: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+    def remove(self, id_challenge: str) -> None:
+        normalized = self.titles.pop(id_challenge, None)
+        if normalized is None:
+            return
+        ids = self.by_title[normalized]
+        ids.discard(id_challenge)
+        if not ids:
+            del self.by_title[normalized]
+            del self.sorted_titles[bisect_left(self.sorted_titles, normalized)]
+        for gram in trigrams(normalized):
+            self.by_trigram[gram].discard(id_challenge)
+
+    def add(self, id_challenge: str, title: str) -> None:
+        normalized = normalize_title(title)
+        if self.titles.get(id_challenge) == normalized:
+            return
+        self.remove(id_challenge)
+        self.titles[id_challenge] = normalized
+        if normalized not in self.by_title:
+            self.by_title[normalized] = set()
+            insort(self.sorted_titles, normalized)
+        self.by_title[normalized].add(id_challenge)
+        for gram in trigrams(normalized):
+            self.by_trigram.setdefault(gram, set()).add(id_challenge)
+
+    def exact(self, query: str) -> List[str]:
+        return sorted(self.by_title.get(normalize_title(query), set()), key=int)
+
+    def prefixed(self, normalized: str) -> List[str]:
+        ids = []
+        for position in range(bisect_left(self.sorted_titles, normalized), len(self.sorted_titles)):
+            title = self.sorted_titles[position]
+            if not title.startswith(normalized):
+                break
+            ids += self.by_title[title]
+        return ids
+
+    def search(self, query: str, limit: int = TITLE_SEARCH_LIMIT,
+               threshold: float = TITLE_SIMILARITY_THRESHOLD) -> List[str]:
+        """ Return challenge ids ranked: exact title, prefix, substring, then trigram similarity """
+        normalized = normalize_title(query)
+        if not normalized:
+            return []
+        ranks: Dict[str, Tuple[int, float]] = {}
+        for id_challenge in self.by_title.get(normalized, set()):
+            ranks[id_challenge] = (0, 0.0)
+        for id_challenge in self.prefixed(normalized):
+            ranks.setdefault(id_challenge, (1, 0.0))
+        query_grams = trigrams(normalized)
+        shared: Dict[str, int] = {}
+        for gram in query_grams:
+            for id_challenge in self.by_trigram.get(gram, ()):
+                shared[id_challenge] = shared.get(id_challenge, 0) + 1
+        for id_challenge, count in shared.items():
+            if id_challenge in ranks:
+                continue
+            title = self.titles[id_challenge]
+            if normalized in title:
+                ranks[id_challenge] = (2, 0.0)
+                continue
+            similarity = count / (len(query_grams) + len(trigrams(title)) - count)
+            if similarity >= threshold:
+                ranks[id_challenge] = (3, -similarity)
+        ranked = sorted(ranks, key=lambda id_challenge: (ranks[id_challenge], self.titles[id_challenge]))
+        return ranked[:limit]
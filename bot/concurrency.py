@@ -0,0 +1,26 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Iterable, List, Optional, TypeVar
+
+from bot.colors import red
+from bot.constants import FETCH_CONCURRENCY
+
+T = TypeVar('T')
+
+
+async def map_concurrently(function: Callable[[T], Awaitable[Any]], items: Iterable[T],
+                           limit: int = FETCH_CONCURRENCY) -> List[Optional[Any]]:
+    """ Await function(item) for every item, at most `limit` at a time
+
+    Results keep the order of items, an item whose call raised gets None and does not affect the others.
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(item: T) -> Optional[Any]:
+        async with semaphore:
+            try:
+                return await function(item)
+            except Exception as exception:
+                red(f'{getattr(function, "__name__", function)}({item}) failed: {exception!r}')
+                return None
+
+    return await asyncio.gather(*[run(item) for item in items])
@@ -3,12 +3,53 @@ emoji2 = 'ok_hand'
 emoji3 = 'thinking'
 emoji4 = 'thinking'
 emoji5 = 'thumbsdown'
-limit_size = 1000
 medals = [':first_place:', ':second_place:', ':third_place:']
 timeout = 20#15
+POOL_SIZE = 20  # max simultaneous connections kept by the shared HTTP session
+POOL_SIZE_PER_HOST = 10
+DNS_CACHE_TTL = 300  # seconds
+KEEPALIVE_TIMEOUT = 30  # seconds
+RATE_LIMIT = 2  # RootMe API requests per second, shared by all callers
+RATE_LIMIT_BURST = 4
+MAX_RETRIES = 5  # attempts per request before giving up
+BACKOFF_BASE = 1  # seconds
+BACKOFF_MAX = 60  # seconds
+CATALOG_REFRESH_INTERVAL = 60  # seconds between two polls of the challenge catalog
+CATALOG_PAGE_SIZE = 50  # challenges per /challenges page
+CATALOG_MISS_TTL = 900  # seconds before details of a challenge that could not be fetched are requested again
+MIRROR_MAX_AGE = 600  # seconds before a mirrored user profile is refreshed by a command
+POLL_MIN_INTERVAL = 15  # seconds between two polls of a RootMe account that just solved a challenge
+POLL_MAX_INTERVAL = 900  # seconds between two polls of an inactive RootMe account
+POLL_RELAX_FACTOR = 1.5  # poll interval growth when nothing new was solved
+POLL_BUDGET = 5  # max RootMe accounts polled per cron cycle
+FETCH_CONCURRENCY = 8  # max API calls awaited at the same time by one command or cron cycle
+GUILD_TICK_DEADLINE = 10  # seconds a cron tick waits for the per-server workers
+GUILD_WORKER_TIMEOUT = 300  # seconds before a per-server cron worker is cancelled
+EVENT_COALESCE_WINDOW = 3  # seconds during which solve notifications are merged into the same embed
+EMBED_MAX_FIELDS = 25  # Discord embed limits
+EMBED_MAX_SIZE = 6000
+EMBED_MAX_NAME_SIZE = 256
+EMBED_MAX_VALUE_SIZE = 1024
+MESSAGE_MAX_SIZE = 2000  # Discord limit for a plain text message
+PAGINATOR_MAX_MESSAGES = 2  # longer outputs are sent as one message paged with reactions
+PAGINATOR_TIMEOUT = 600  # seconds during which a paged message answers to reactions
+SEND_WORKERS = 4  # channels sent to in parallel by the outbound message queue
+SEND_QUEUE_MAX_DEPTH = 50  # messages queued for one channel before senders wait
+SEND_MAX_RETRIES = 3  # attempts for a message failing with a transient error
+SINCE_MAX_DAYS = 365  # longest window accepted by !since
+SCOREBOARD_PAGE_SIZE = 20  # users per !scoreboard page
+FLUSH_HISTORY_LIMIT = 1000  # messages of the bot channel looked at by !flush
+BULK_DELETE_SIZE = 100  # Discord limit of messages deleted by one request
+BULK_DELETE_MAX_AGE = 14 * 24 * 3600 - 60  # seconds, older messages cannot be bulk deleted
+TITLE_SEARCH_LIMIT = 10  # max challenges proposed when a !who_solved query is ambiguous
+TITLE_SIMILARITY_THRESHOLD = 0.3  # min trigram similarity for a fuzzy title match
 URL = 'https://api.www.root-me.org'
 LANGS = ['en', 'fr', 'de', 'es']
 FILENAME = 'data/data.json'
+SQLITE_FILENAME = 'data/data.sqlite3'  # used when DATABASE_BACKEND=sqlite
+CATALOG_SNAPSHOT = 'data/challenges.json'
+JOURNAL_MAX_ENTRIES = 500  # database journal records before it is compacted into FILENAME
+JOURNAL_COMPACT_INTERVAL = 600  # seconds, a non-empty journal older than this is compacted, checked after writes and periodically
 VERSION = '1.3'
 GITHUB_REPOSITORY = 'https://github.com/zteeed/RootMeBot'
 ROOTME_WEBSITE = 'https://www.root-me.org'
@@ -0,0 +1,117 @@
+from bisect import bisect_left, insort
+from typing import Any, Dict, List, Optional, Tuple
+
+entry_type = Tuple[int, str]  # (-score, rootme_username), sorted ascending means best score first
+
+
+class Leaderboard:
+
+    def __init__(self, users: List[Dict[str, Any]]):
+        """ Ranking of one discord server kept sorted as scores change, no full sort on display """
+        self.scores: Dict[str, int] = {user['rootme_username']: int(user['score']) for user in users}
+        self.entries: List[entry_type] = sorted((-score, username) for username, score in self.scores.items())
+        self.overtakes: List[Tuple[str, str]] = []  # (overtaker, overtaken) usernames not notified yet
+        self.version = 0  # bumped when the ranking changes, rendered pages are cached per version
+        self.rendered: Dict[Tuple[int, int], str] = {}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def changed(self) -> None:
+        self.version += 1
+        self.rendered = {}
+
+    def insert(self, username: str, score: int) -> None:
+        if username in self.scores:
+            self.remove(username)
+        self.scores[username] = score
+        insort(self.entries, (-score, username))
+        self.changed()
+
+    def remove(self, username: str) -> None:
+        score = self.scores.pop(username, None)
+        if score is None:
+            return
+        del self.entries[bisect_left(self.entries, (-score, username))]
+        self.changed()
+
+    def clear(self) -> None:
+        self.scores, self.entries = {}, []
+        self.changed()
+
+    def update(self, username: str, score: int) -> None:
+        """ Move a user to its new rank, users passed either way are recorded as (overtaker, overtaken) """
+        old_score = self.scores.get(username)
+        if old_score is None or old_score == score:
+            return
+        old_rank = bisect_left(self.entries, (-old_score, username))
+        del self.entries[old_rank]
+        new_rank = bisect_left(self.entries, (-score, username))
+        self.entries.insert(new_rank, (-score, username))
+        self.scores[username] = score
+        for negative_score, overtaken in self.entries[new_rank + 1:old_rank + 1]:  # moved up
+            if -negative_score < score:
+                self.overtakes.append((username, overtaken))
+        for negative_score, overtaker in self.entries[old_rank:new_rank]:  # moved down, users now above it
+            if -negative_score > score:
+                self.overtakes.append((overtaker, username))
+        self.changed()
+
+    def rank(self, username: str) -> Optional[int]:
+        """ 1-based rank of a user """
+        score = self.scores.get(username)
+        if score is None:
+            return None
+        return bisect_left(self.entries, (-score, username)) + 1
+
+    def page(self, number: int, size: int) -> List[Tuple[int, str, int]]:
+        """ (rank, username, score) of a 1-based page """
+        start = (number - 1) * size
+        return [(start + index + 1, username, -negative_score)
+                for index, (negative_score, username) in enumerate(self.entries[start:start + size])]
+
+    def pages(self, size: int) -> int:
+        return max(1, -(-len(self.entries) // size))
+
+    def pop_overtakes(self) -> List[Tuple[str, str]]:
+        overtakes, self.overtakes = self.overtakes, []
+        return overtakes
+
+
+class Leaderboards:
+
+    def __init__(self):
+        """ Leaderboard of each discord server, loaded on first use then kept up to date from journal records """
+        self.boards: Dict[int, Leaderboard] = {}
+
+    def get(self, id_discord_server: int) -> Optional[Leaderboard]:
+        return self.boards.get(id_discord_server)
+
+    def load(self, id_discord_server: int, users: List[Dict[str, Any]]) -> Leaderboard:
+        board = self.boards[id_discord_server] = Leaderboard(users)
+        return board
+
+    def apply(self, record: Dict[str, Any]) -> None:
+        """ Follow a database record (see Transaction), servers not loaded yet are ignored """
+        operation = record['op']
+        if operation == 'create_user':
+            board = self.get(record['user']['id_discord_server'])
+            if board is not None:
+                board.insert(record['user']['rootme_username'], int(record['user']['score']))
+            return
+        board = self.get(record.get('id_discord_server'))
+        if board is None:
+            return
+        if operation == 'delete_user':
+            board.remove(record['rootme_username'])
+        elif operation == 'delete_users':
+            if record['rootme_usernames'] is None:
+                board.clear()
+            else:
+                for username in record['rootme_usernames']:
+                    board.remove(username)
+        elif operation == 'update_user_info':
+            board.update(record['rootme_username'], int(record['score']))
+        elif operation == 'update_users_info':
+            for user_info in record['users']:
+                board.update(user_info['rootme_username'], int(user_info['score']))
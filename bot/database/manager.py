@@ -1,7 +1,12 @@
+import asyncio
 import json
+import os
+import time
 from typing import Any, List, Dict, Optional, Union
 
-import aiofiles
+from bot.colors import green, red
+from bot.constants import JOURNAL_COMPACT_INTERVAL, JOURNAL_MAX_ENTRIES
+from bot.database.leaderboard import Leaderboard, Leaderboards
 
 users_type = List[Dict[str, str]]
 user_type = Dict[str, str]
@@ -11,32 +16,220 @@ response_content_type = Optional[Dict[str, Any]]
 rootme_challenge_list = Optional[List[Dict[str, str]]]
 
 
+def fsync_directory(filename: str) -> None:
+    """ Make a rename durable """
+    directory = os.open(os.path.dirname(os.path.abspath(filename)), os.O_RDONLY)
+    try:
+        os.fsync(directory)
+    finally:
+        os.close(directory)
+
+
+class Transaction:
+
+    def __init__(self, db: 'DatabaseManager'):
+        """ Buffer mutations and commit them at once (one journal write / one SQL transaction) when leaving the block """
+        self.db = db
+        self.records: List[Dict[str, Any]] = []
+
+    async def __aenter__(self) -> 'Transaction':
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None and self.records:  # nothing is committed if the block raised
+            await self.db.commit_batch(self.records)
+
+    def register_server(self, id_discord_server: int) -> None:
+        self.records.append({'op': 'register_server', 'id': id_discord_server})
+
+    def update_server_language(self, id_discord_server: int, lang: str) -> None:
+        self.records.append({'op': 'update_server_language', 'id': id_discord_server, 'lang': lang})
+
+    def create_user(self, id_discord_server: int, rootme_user_id: int, username: str, score: int,
+                    number_challenge_solved: int) -> None:
+        new_user = dict(id_discord_server=id_discord_server, rootme_user_id=rootme_user_id, rootme_username=username,
+                        score=score, number_challenge_solved=number_challenge_solved)
+        self.records.append({'op': 'create_user', 'user': new_user})
+
+    def delete_user(self, id_discord_server: int, username: str) -> None:
+        self.records.append({'op': 'delete_user', 'id_discord_server': id_discord_server, 'rootme_username': username})
+
+    def delete_users(self, id_discord_server: int, usernames: Optional[List[str]] = None) -> None:
+        """ Delete several users of a server, all of them if usernames is None """
+        self.records.append({'op': 'delete_users', 'id_discord_server': id_discord_server,
+                             'rootme_usernames': usernames})
+
+    def update_user_info(self, id_discord_server: int, username: str, score: int,
+                         number_challenge_solved: int) -> None:
+        self.records.append({'op': 'update_user_info', 'id_discord_server': id_discord_server,
+                             'rootme_username': username, 'score': score,
+                             'number_challenge_solved': number_challenge_solved})
+
+    def update_users_info(self, id_discord_server: int, users: List[Dict[str, Any]]) -> None:
+        """ users: dicts with rootme_username, score and number_challenge_solved keys """
+        updates = [dict(rootme_username=user['rootme_username'], score=user['score'],
+                        number_challenge_solved=user['number_challenge_solved']) for user in users]
+        self.records.append({'op': 'update_users_info', 'id_discord_server': id_discord_server, 'users': updates})
+
+
 class DatabaseManager:
 
     def __init__(self, filename: str, rootme_challenges: rootme_challenge_list):
+        """ Data lives in memory, mutations are appended to a journal compacted into filename from time to time """
         self.filename = filename
+        self.journal_filename = f'{filename}.journal'
         self.rootme_challenges = rootme_challenges
+        self.servers: Dict[int, server_type] = {}
+        self.users: Dict[int, Dict[str, user_type]] = {}  # id_discord_server -> rootme_username -> user
+        self.leaderboards = Leaderboards()
+        self.pending: List[Dict[str, Any]] = []  # journal records not written yet
+        self.journal_entries = 0
+        self.compacted_at = time.monotonic()
+        self._flush_task: Optional[asyncio.Future] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self.load()
 
-    async def read_data(self):
-        async with aiofiles.open(self.filename, mode='r') as f:
-            content = await f.read()
-        return json.loads(content)
+    def load(self) -> None:
+        try:
+            with open(self.filename, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            data = {'discord_servers': [], 'users': []}
+        for server in data['discord_servers']:
+            self.servers[server['id']] = server
+        for user in data['users']:
+            self.users.setdefault(user['id_discord_server'], {})[user['rootme_username']] = user
+        try:
+            with open(self.journal_filename, 'r') as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            lines = []
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:  # record partially written before a crash
+                red(f'Skipping corrupted record in {self.journal_filename}')
+                continue
+            self.apply(record)
+            self.journal_entries += 1
+        green(f'Database loaded from {self.filename} ({self.journal_entries} journal records replayed)')
+
+    def apply(self, record: Dict[str, Any]) -> None:
+        """ Apply a journal record to memory, records are idempotent so they may be replayed safely """
+        operation = record['op']
+        if operation == 'register_server':
+            self.servers.setdefault(record['id'], {'id': record['id']})
+        elif operation == 'update_server_language':
+            if record['id'] in self.servers:
+                self.servers[record['id']]['lang'] = record['lang']
+        elif operation == 'create_user':
+            user = record['user']
+            self.users.setdefault(user['id_discord_server'], {})[user['rootme_username']] = dict(user)
+        elif operation == 'delete_user':
+            self.users.get(record['id_discord_server'], {}).pop(record['rootme_username'], None)
+        elif operation == 'delete_users':
+            server_users = self.users.get(record['id_discord_server'], {})
+            usernames = record['rootme_usernames']
+            for username in list(server_users) if usernames is None else usernames:
+                server_users.pop(username, None)
+        elif operation == 'update_user_info':
+            self.apply_user_info(record['id_discord_server'], record)
+        elif operation == 'update_users_info':
+            for user_info in record['users']:
+                self.apply_user_info(record['id_discord_server'], user_info)
 
-    async def write_data(self, content):
-        content = json.dumps(content)
-        async with aiofiles.open(self.filename, mode='w') as f:
-            await f.write(content)
+    def apply_user_info(self, id_discord_server: int, user_info: Dict[str, Any]) -> None:
+        user = self.users.get(id_discord_server, {}).get(user_info['rootme_username'])
+        if user is not None:
+            user['score'] = user_info['score']
+            user['number_challenge_solved'] = user_info['number_challenge_solved']
+
+    def dump(self) -> Dict[str, List[Dict[str, Any]]]:
+        users = [user for server_users in self.users.values() for user in server_users.values()]
+        return {'discord_servers': list(self.servers.values()), 'users': users}
+
+    def transaction(self) -> Transaction:
+        return Transaction(self)
+
+    async def commit_batch(self, records: List[Dict[str, Any]]) -> None:
+        """ Apply records in memory right away, they are written to the journal in the background """
+        for record in records:
+            self.apply(record)
+            self.leaderboards.apply(record)
+        self.pending += records
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.ensure_future(self.flush())
+
+    def write_journal(self, records: List[Dict[str, Any]]) -> None:
+        with open(self.journal_filename, 'a') as f:
+            f.write(''.join(json.dumps(record) + '\n' for record in records))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def write_snapshot(self, content: str) -> None:
+        tmp_filename = f'{self.filename}.tmp'
+        with open(tmp_filename, 'w') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_filename, self.filename)
+        fsync_directory(self.filename)
+        with open(self.journal_filename, 'w') as f:  # records are now part of the snapshot
+            os.fsync(f.fileno())
+
+    def should_compact(self) -> bool:
+        if self.journal_entries >= JOURNAL_MAX_ENTRIES:
+            return True
+        return self.journal_entries > 0 and time.monotonic() - self.compacted_at >= JOURNAL_COMPACT_INTERVAL
+
+    async def flush(self) -> None:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        loop = asyncio.get_event_loop()
+        async with self._lock:
+            while True:
+                while self.pending:  # records committed during a write are written by the same task
+                    records, self.pending = self.pending, []
+                    try:
+                        await loop.run_in_executor(None, self.write_journal, records)
+                    except OSError as exception:
+                        red(f'Cannot write {self.journal_filename}: {exception}')
+                        self.pending = records + self.pending
+                        return
+                    self.journal_entries += len(records)
+                if not self.should_compact():
+                    break
+                await self.compact()
+
+    async def compact_forever(self, interval: float = JOURNAL_COMPACT_INTERVAL) -> None:
+        """ Compact an idle journal too, flush() only checks the interval after a write """
+        while True:
+            await asyncio.sleep(interval)
+            await self.flush()
+
+    async def compact(self) -> None:
+        """ Rewrite the whole database atomically and start a new journal """
+        content = json.dumps(self.dump())
+        await asyncio.get_event_loop().run_in_executor(None, self.write_snapshot, content)
+        self.journal_entries = 0
+        self.compacted_at = time.monotonic()
+
+    async def close(self) -> None:
+        await self.flush()
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            await self.compact()
+
+    async def read_data(self):
+        return self.dump()
 
     async def is_server_registered(self, id_discord_server: int):
-        data = await self.read_data()
-        discord_servers = data['discord_servers']
-        discord_servers_id = [server['id'] for server in discord_servers]
-        return id_discord_server in discord_servers_id
+        return id_discord_server in self.servers
 
     async def register_server(self, id_discord_server: int):
-        data = await self.read_data()
-        data['discord_servers'].append({'id': id_discord_server})
-        await self.write_data(data)
+        async with self.transaction() as transaction:
+            transaction.register_server(id_discord_server)
 
     @staticmethod
     def find_server(servers: servers_type, id_discord_server: int) -> Optional[server_type]:
@@ -45,17 +238,11 @@ class DatabaseManager:
                 return server
 
     async def get_server_language(self, id_discord_server: int):
-        data = await self.read_data()
-        servers = data['discord_servers']
-        server = self.find_server(servers, id_discord_server)
-        return server['lang']
+        return self.servers[id_discord_server]['lang']
 
     async def update_server_language(self, id_discord_server: int, lang: str):
-        data = await self.read_data()
-        servers = data['discord_servers']
-        server = self.find_server(servers, id_discord_server)
-        server['lang'] = lang
-        await self.write_data(data)
+        async with self.transaction() as transaction:
+            transaction.update_server_language(id_discord_server, lang)
 
     @staticmethod
     def find_user(users: users_type, id_discord_server: int, username: str) -> Optional[user_type]:
@@ -64,33 +251,41 @@ class DatabaseManager:
                 return user
 
     async def user_exists(self, id_discord_server: int, username: str) -> bool:
-        data = await self.read_data()
-        users = data['users']
-        return self.find_user(users, id_discord_server, username) is not None
+        return username in self.users.get(id_discord_server, {})
 
     async def create_user(self, id_discord_server: int, rootme_user_id: int, username: str, score: int,
                           number_challenge_solved: int):
-        new_user = dict(id_discord_server=id_discord_server, rootme_user_id=rootme_user_id, rootme_username=username,
-                        score=score, number_challenge_solved=number_challenge_solved)
-        data = await self.read_data()
-        data['users'].append(new_user)
-        await self.write_data(data)
+        async with self.transaction() as transaction:
+            transaction.create_user(id_discord_server, rootme_user_id, username, score, number_challenge_solved)
 
     async def delete_user(self, id_discord_server, username: str):
-        data = await self.read_data()
-        users = data['users']
-        user = self.find_user(users, id_discord_server, username)
-        users.remove(user)
-        await self.write_data(data)
+        async with self.transaction() as transaction:
+            transaction.delete_user(id_discord_server, username)
+
+    async def delete_users(self, id_discord_server: int, usernames: Optional[List[str]] = None):
+        async with self.transaction() as transaction:
+            transaction.delete_users(id_discord_server, usernames)
 
     async def update_user_info(self, id_discord_server: int, username: str, score: int, number_challenge_solved: int):
-        data = await self.read_data()
-        users = data['users']
-        user = self.find_user(users, id_discord_server, username)
-        user['score'] = score
-        user['number_challenge_solved'] = number_challenge_solved
-        await self.write_data(data)
+        async with self.transaction() as transaction:
+            transaction.update_user_info(id_discord_server, username, score, number_challenge_solved)
+
+    async def update_users_info(self, id_discord_server: int, users: List[Dict[str, Any]]):
+        async with self.transaction() as transaction:
+            transaction.update_users_info(id_discord_server, users)
 
     async def select_users(self, id_discord_server: int):
-        data = await self.read_data()
-        return [user for user in data['users'] if user['id_discord_server'] == id_discord_server]
+        return [dict(user) for user in self.users.get(id_discord_server, {}).values()]
+
+    async def leaderboard(self, id_discord_server: int) -> Leaderboard:
+        """ Ranking of a server, built once then updated by each committed record """
+        board = self.leaderboards.get(id_discord_server)
+        if board is None:
+            board = self.leaderboards.load(id_discord_server, await self.select_users(id_discord_server))
+        return board
+
+    async def select_rootme_user_ids(self, id_discord_servers: List[int]) -> List[int]:
+        """ Distinct RootMe accounts tracked by any of the given servers """
+        id_users = {int(user['rootme_user_id']) for id_discord_server in id_discord_servers
+                    for user in self.users.get(id_discord_server, {}).values()}
+        return sorted(id_users)
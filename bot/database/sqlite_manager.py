@@ -0,0 +1,153 @@
+import asyncio
+import sqlite3
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+from bot.colors import green
+from bot.database.leaderboard import Leaderboards
+from bot.database.manager import DatabaseManager, rootme_challenge_list
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS discord_servers (
+    id INTEGER PRIMARY KEY,
+    lang TEXT
+);
+CREATE TABLE IF NOT EXISTS users (
+    id_discord_server INTEGER NOT NULL,
+    rootme_user_id INTEGER NOT NULL,
+    rootme_username TEXT NOT NULL,
+    score INTEGER NOT NULL DEFAULT 0,
+    number_challenge_solved INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (id_discord_server, rootme_username)
+);
+CREATE INDEX IF NOT EXISTS users_rootme_user_id ON users (rootme_user_id);
+"""
+user_columns = 'id_discord_server, rootme_user_id, rootme_username, score, number_challenge_solved'
+
+
+class SQLiteDatabaseManager(DatabaseManager):
+
+    def __init__(self, filename: str, rootme_challenges: rootme_challenge_list):
+        """ DatabaseManager stored in SQLite, queries run in a dedicated thread to keep the event loop free """
+        self.filename = filename
+        self.rootme_challenges = rootme_challenges
+        self.leaderboards = Leaderboards()
+        self.executor = ThreadPoolExecutor(max_workers=1)  # sqlite connections are not shared between threads
+        self.connection = self.executor.submit(self.connect).result()
+
+    def connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.filename, check_same_thread=False)
+        connection.row_factory = sqlite3.Row
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.executescript(SCHEMA)
+        connection.commit()
+        green(f'Database loaded from {self.filename}')
+        return connection
+
+    async def run(self, function: Callable[..., Any], *args) -> Any:
+        return await asyncio.get_event_loop().run_in_executor(self.executor, function, *args)
+
+    def fetch_all(self, query: str, parameters: tuple = ()) -> List[Dict[str, Any]]:
+        return [dict(row) for row in self.connection.execute(query, parameters).fetchall()]
+
+    def execute_record(self, record: Dict[str, Any]) -> None:
+        """ Translate a journal record (see Transaction) into SQL """
+        operation = record['op']
+        if operation == 'register_server':
+            self.connection.execute('INSERT OR IGNORE INTO discord_servers (id) VALUES (?)', (record['id'],))
+        elif operation == 'update_server_language':
+            self.connection.execute('UPDATE discord_servers SET lang = ? WHERE id = ?', (record['lang'], record['id']))
+        elif operation == 'create_user':
+            user = record['user']
+            self.connection.execute(f'INSERT OR REPLACE INTO users ({user_columns}) VALUES (?, ?, ?, ?, ?)',
+                                    (user['id_discord_server'], user['rootme_user_id'], user['rootme_username'],
+                                     user['score'], user['number_challenge_solved']))
+        elif operation == 'delete_user':
+            self.connection.execute('DELETE FROM users WHERE id_discord_server = ? AND rootme_username = ?',
+                                    (record['id_discord_server'], record['rootme_username']))
+        elif operation == 'delete_users':
+            if record['rootme_usernames'] is None:
+                self.connection.execute('DELETE FROM users WHERE id_discord_server = ?', (record['id_discord_server'],))
+            else:
+                self.connection.executemany('DELETE FROM users WHERE id_discord_server = ? AND rootme_username = ?',
+                                            [(record['id_discord_server'], username)
+                                             for username in record['rootme_usernames']])
+        elif operation in ('update_user_info', 'update_users_info'):
+            users = [record] if operation == 'update_user_info' else record['users']
+            self.connection.executemany('UPDATE users SET score = ?, number_challenge_solved = ? '
+                                        'WHERE id_discord_server = ? AND rootme_username = ?',
+                                        [(user['score'], user['number_challenge_solved'],
+                                          record['id_discord_server'], user['rootme_username']) for user in users])
+
+    def write_records(self, records: List[Dict[str, Any]]) -> None:
+        with self.connection:  # one transaction: commit, or rollback on error
+            for record in records:
+                self.execute_record(record)
+
+    async def commit_batch(self, records: List[Dict[str, Any]]) -> None:
+        await self.run(self.write_records, records)
+        for record in records:
+            self.leaderboards.apply(record)
+
+    async def compact_forever(self, interval: float = 0) -> None:
+        """ SQLite has no journal of its own to compact """
+
+    async def close(self) -> None:
+        await self.run(self.connection.close)
+        self.executor.shutdown()
+
+    async def read_data(self):
+        servers = await self.run(self.fetch_all, 'SELECT * FROM discord_servers')
+        users = await self.run(self.fetch_all, f'SELECT {user_columns} FROM users')
+        servers = [{key: value for key, value in server.items() if value is not None} for server in servers]
+        return {'discord_servers': servers, 'users': users}
+
+    async def is_server_registered(self, id_discord_server: int):
+        rows = await self.run(self.fetch_all, 'SELECT id FROM discord_servers WHERE id = ?', (id_discord_server,))
+        return len(rows) > 0
+
+    async def get_server_language(self, id_discord_server: int):
+        rows = await self.run(self.fetch_all, 'SELECT lang FROM discord_servers WHERE id = ?', (id_discord_server,))
+        return rows[0]['lang']
+
+    async def user_exists(self, id_discord_server: int, username: str) -> bool:
+        rows = await self.run(self.fetch_all, 'SELECT 1 FROM users WHERE id_discord_server = ? AND rootme_username = ?',
+                              (id_discord_server, username))
+        return len(rows) > 0
+
+    async def select_users(self, id_discord_server: int):
+        return await self.run(self.fetch_all, f'SELECT {user_columns} FROM users WHERE id_discord_server = ?',
+                              (id_discord_server,))
+
+    async def select_rootme_user_ids(self, id_discord_servers: List[int]) -> List[int]:
+        if not id_discord_servers:
+            return []
+        placeholders = ', '.join('?' * len(id_discord_servers))
+        rows = await self.run(self.fetch_all, f'SELECT DISTINCT rootme_user_id FROM users '
+                                              f'WHERE id_discord_server IN ({placeholders}) ORDER BY rootme_user_id',
+                              tuple(id_discord_servers))
+        return [row['rootme_user_id'] for row in rows]
+
+
+def migrate_from_json(json_filename: str, sqlite_filename: str) -> None:
+    """ Offline migration: copy a JSON database (journal included) into a SQLite one """
+    data = DatabaseManager(json_filename, None).dump()
+    connection = sqlite3.connect(sqlite_filename)
+    connection.executescript(SCHEMA)
+    with connection:
+        connection.executemany('INSERT OR REPLACE INTO discord_servers (id, lang) VALUES (?, ?)',
+                               [(server['id'], server.get('lang')) for server in data['discord_servers']])
+        connection.executemany(f'INSERT OR REPLACE INTO users ({user_columns}) VALUES (?, ?, ?, ?, ?)',
+                               [(user['id_discord_server'], user['rootme_user_id'], user['rootme_username'],
+                                 user['score'], user['number_challenge_solved']) for user in data['users']])
+    connection.close()
+    green(f'{len(data["discord_servers"])} servers and {len(data["users"])} users migrated to {sqlite_filename}')
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print('Usage: python3 -m bot.database.sqlite_manager <data.json> <data.sqlite3>')
+        sys.exit(1)
+    migrate_from_json(sys.argv[1], sys.argv[2])
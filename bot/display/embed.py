@@ -1,9 +1,8 @@
 import json
 from html import unescape
 from os import environ
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
 
-import discord
 from discord.channel import TextChannel
 from discord.ext.commands.bot import Bot
 from discord.ext.commands.context import Context
@@ -11,33 +10,46 @@ from discord.guild import Guild
 
 import bot.display.show as show
 from bot.colors import green, red, yellow
-from bot.constants import PROJECT_INFORMATION
+from bot.constants import MESSAGE_MAX_SIZE, PROJECT_INFORMATION, SCOREBOARD_PAGE_SIZE
 from bot.database.manager import DatabaseManager
+from bot.display.events import solve_events
+from bot.display.paginator import join_lines, paginator
+from bot.display.send_queue import send_queue
 from bot.manage.discord_data import get_command_args
 
 BOT_CHANNEL = environ.get('BOT_CHANNEL')
 
 
-def display(part: str) -> None:
-    lines = part.split('\n')
-    for line in lines:
+def display(message: str) -> None:
+    for line in message.split('\n'):
         yellow(line)
 
 
+def message_lines(message: str) -> Iterator[str]:
+    return (line for line in message.rstrip('\n').split('\n'))
+
+
 async def interrupt(channel: TextChannel, message: str, embed_color: Optional[int] = None,
                     embed_name: Optional[str] = None) -> None:
     if str(channel) != BOT_CHANNEL or not message:
         return
-    parts = show.display_parts(message)
-    for part in parts:
-        display(part)
-        if embed_color is None or embed_name is None:
-            await channel.send(part)
-        else:
-            embed = discord.Embed(color=embed_color)
-            embed.add_field(name=embed_name, value=part, inline=False)
-            embed.set_footer(text=PROJECT_INFORMATION['footer'])
-            await channel.send(embed=embed)
+    display(message)
+    if embed_color is None or embed_name is None:
+        for part in join_lines(message_lines(message), MESSAGE_MAX_SIZE):
+            await send_queue.send(channel, content=part)
+    else:
+        await paginator.send(channel, [(embed_name, message_lines(message))], embed_color)
+
+
+async def interrupt_sections(channel: TextChannel, sections: List[Tuple[str, str]], embed_color: int) -> None:
+    """ Several titled messages packed together into as few embeds as possible """
+    sections = [(embed_name, message) for embed_name, message in sections if message]
+    if str(channel) != BOT_CHANNEL or not sections:
+        return
+    for _, message in sections:
+        display(message)
+    await paginator.send(channel, [(embed_name, message_lines(message)) for embed_name, message in sections],
+                         embed_color)
 
 
 async def info(context: Context) -> None:
@@ -71,13 +83,24 @@ async def remove_user(db: DatabaseManager, context: Context) -> None:
 
 
 async def scoreboard(db: DatabaseManager, context: Context) -> None:
-    users = await db.select_users(context.guild.id)
-    if not users:
-        tosend = f'No users in team, you might add some with ' \
-            f'{context.bot.command_prefix}{context.command} {context.command.help.strip()}'
-    else:
-        tosend = await show.display_scoreboard(db, context.guild.id)
-    await interrupt(context.message.channel, tosend, embed_color=0x4200d4, embed_name="Scoreboard")
+    args = get_command_args(context)
+
+    if len(args) > 1 or (args and not args[0].isdigit()):
+        tosend = f'Use {context.bot.command_prefix}{context.command} {context.command.help.strip()}'
+        await interrupt(context.message.channel, tosend, embed_color=0xD81948, embed_name="ERROR")
+        return
+
+    board = await db.leaderboard(context.guild.id)
+    if not len(board):
+        tosend = f'No users in team, you might add some with {context.bot.command_prefix}add_user <username>'
+        await interrupt(context.message.channel, tosend, embed_color=0x4200d4, embed_name="Scoreboard")
+        return
+
+    pages = board.pages(SCOREBOARD_PAGE_SIZE)
+    page = min(max(int(args[0]), 1), pages) if args else 1
+    tosend = await show.display_scoreboard(db, context.guild.id, page=page)
+    embed_name = f'Scoreboard ({page}/{pages})' if pages > 1 else 'Scoreboard'
+    await interrupt(context.message.channel, tosend, embed_color=0x4200d4, embed_name=embed_name)
 
 
 async def who_solved(db: DatabaseManager, context: Context) -> None:
@@ -95,19 +118,19 @@ async def who_solved(db: DatabaseManager, context: Context) -> None:
 
 async def display_by_blocks_duration(context: Context, tosend_list: List[str], color: int, duration_msg: str = '') \
         -> None:
+    if tosend_list and tosend_list[0]['user'] is None:
+        embed_name = f"Challenges solved {duration_msg}"
+        await interrupt(context.message.channel, tosend_list[0]['msg'], embed_color=color, embed_name=embed_name)
+        return
+
+    sections = []
     for block in tosend_list:
         red(block)
-        tosend = block['msg']
-
-        if block['user'] is None:
-            embed_name = f"Challenges solved {duration_msg}"
-            tosend = tosend_list[0]['msg']
-            await interrupt(context.message.channel, tosend, embed_color=color, embed_name=embed_name)
-            return
-
-        if tosend:
-            embed_name = f"Challenges solved by {block['user']['rootme_username']} {duration_msg}"
-            await interrupt(context.message.channel, tosend, embed_color=color, embed_name=embed_name)
+        if isinstance(block['user'], str):  # unknown user
+            sections.append((f"Challenges solved {duration_msg}", block['msg']))
+        else:
+            sections.append((f"Challenges solved by {block['user']['rootme_username']} {duration_msg}", block['msg']))
+    await interrupt_sections(context.message.channel, sections, color)
 
 
 async def duration(db: DatabaseManager, context: Context, duration_command: str = 'today',
@@ -136,11 +159,22 @@ async def today(db: DatabaseManager, context: Context) -> None:
     await duration(db, context, duration_command='today', duration_msg='since last 24h')
 
 
+async def since(db: DatabaseManager, context: Context) -> None:
+    args = get_command_args(context)
+    delay = show.parse_duration(args[0]) if 1 <= len(args) <= 2 else None
+
+    if delay is None:
+        tosend = f'Use {context.bot.command_prefix}{context.command} {context.command.help.strip()}'
+        await interrupt(context.message.channel, tosend, embed_color=0xD81948, embed_name="ERROR")
+        return
+
+    tosend_list = await show.display_duration(db, context, args[1:], delay)
+    await display_by_blocks_duration(context, tosend_list, 0x00C7FF, duration_msg=f'since last {args[0]}')
+
+
 async def display_by_blocks_diff(channel: TextChannel, tosend_list: List[Dict[str, str]], color: int) -> None:
-    for block in tosend_list:
-        if block['msg']:
-            embed_name = f"Challenges solved by {block['user']} "
-            await interrupt(channel, block['msg'], embed_color=color, embed_name=embed_name)
+    sections = [(f"Challenges solved by {block['user']} ", block['msg']) for block in tosend_list]
+    await interrupt_sections(channel, sections, color)
 
 
 async def diff(db: DatabaseManager, context: Context) -> None:
@@ -196,12 +230,12 @@ async def check_new_server(channel: TextChannel, server: Guild, db: DatabaseMana
     await interrupt(channel, tosend, embed_color=embed_color, embed_name=embed_name)
 
 
-async def cron(channel: TextChannel, server: Guild, db: DatabaseManager, bot: Bot) -> None:
-    await check_new_server(channel, server, db, bot.command_prefix)
+async def cron(channels: List[TextChannel], server: Guild, db: DatabaseManager, bot: Bot) -> None:
+    await check_new_server(channels[0], server, db, bot.command_prefix)
     messages = await show.display_cron(server.id, db)
-    for tosend_cron, name in messages:
-        if tosend_cron is not None:
-            await interrupt(channel, tosend_cron, embed_color=0xFFCC00, embed_name=name)
+    events = [(name, tosend_cron) for name, tosend_cron in messages if tosend_cron is not None]
+    for channel in channels:
+        solve_events.publish(channel, events)
 
 
 async def api_query(context: Context) -> None:
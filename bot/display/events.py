@@ -0,0 +1,70 @@
+import asyncio
+from typing import Dict, List, Tuple
+
+import discord
+from discord.channel import TextChannel
+
+from bot.colors import yellow
+from bot.constants import EVENT_COALESCE_WINDOW, PROJECT_INFORMATION
+from bot.display.paginator import pack_fields
+from bot.display.send_queue import send_queue
+
+event_type = Tuple[str, str]  # (title, text)
+
+
+class SolveEventBus:
+
+    def __init__(self, window: float = EVENT_COALESCE_WINDOW, color: int = 0xFFCC00):
+        """ Queue between solve detection and delivery, events of a channel are merged into multi-field embeds """
+        self.window = window
+        self.color = color
+        self.queues: Dict[int, asyncio.Queue] = {}  # channel id -> events
+        self.workers: Dict[int, asyncio.Future] = {}
+
+    def publish(self, channel: TextChannel, events: List[event_type]) -> None:
+        if not events:
+            return
+        queue = self.queues.get(channel.id)
+        if queue is None:
+            queue = self.queues[channel.id] = asyncio.Queue()
+        for event in events:
+            queue.put_nowait(event)
+        worker = self.workers.get(channel.id)
+        if worker is None or worker.done():
+            self.workers[channel.id] = asyncio.ensure_future(self.deliver(channel, queue))
+
+    async def collect(self, queue: asyncio.Queue) -> List[event_type]:
+        """ Wait for one event, then for more during the coalescing window """
+        events = [await queue.get()]
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + self.window
+        while True:
+            while not queue.empty():
+                events.append(queue.get_nowait())
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return events
+            try:
+                events.append(await asyncio.wait_for(queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                return events
+
+    async def deliver(self, channel: TextChannel, queue: asyncio.Queue) -> None:
+        footer = PROJECT_INFORMATION['footer']
+        while True:
+            events = await self.collect(queue)
+            for fields in pack_fields(events, reserved=len(footer)):
+                embed = discord.Embed(color=self.color)
+                for title, text in fields:
+                    yellow(f'{title}: {text}')
+                    embed.add_field(name=title, value=text, inline=False)
+                embed.set_footer(text=footer)
+                await send_queue.send(channel, embed=embed)
+
+    def cancel(self) -> None:
+        for worker in self.workers.values():
+            worker.cancel()
+        self.workers = {}
+
+
+solve_events = SolveEventBus()
@@ -0,0 +1,128 @@
+import asyncio
+import time
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import discord
+from discord.channel import TextChannel
+
+from bot.colors import red
+from bot.constants import EMBED_MAX_FIELDS, EMBED_MAX_NAME_SIZE, EMBED_MAX_SIZE, EMBED_MAX_VALUE_SIZE, \
+    PAGINATOR_MAX_MESSAGES, PAGINATOR_TIMEOUT, PROJECT_INFORMATION
+from bot.display.send_queue import send_queue
+
+field_type = Tuple[str, str]  # (name, value)
+section_type = Tuple[str, Iterable[str]]  # (title, lines)
+PREVIOUS_PAGE, NEXT_PAGE = '◀️', '▶️'
+
+
+def join_lines(lines: Iterable[str], max_size: int) -> Iterator[str]:
+    """ Join lines into chunks of at most max_size characters, a longer line is cut """
+    chunk, size = [], 0
+    for line in lines:
+        while len(line) > max_size:
+            if chunk:
+                yield '\n'.join(chunk)
+                chunk, size = [], 0
+            yield line[:max_size]
+            line = line[max_size:]
+        if chunk and size + 1 + len(line) > max_size:
+            yield '\n'.join(chunk)
+            chunk, size = [], 0
+        size += len(line) + (1 if chunk else 0)
+        chunk.append(line)
+    if chunk:
+        yield '\n'.join(chunk)
+
+
+def section_fields(sections: Iterable[section_type]) -> Iterator[field_type]:
+    """ One field per chunk of a section, following fields of the same section have a blank name """
+    for title, lines in sections:
+        for index, value in enumerate(join_lines(lines, EMBED_MAX_VALUE_SIZE)):
+            yield (title if index == 0 else '\u200b'), value
+
+
+def pack_fields(fields: Iterable[field_type], reserved: int = 0) -> List[List[field_type]]:
+    """ Group fields, in order, into as few embeds as Discord allows (fields count and total size)
+
+    A value longer than a field allows is split on line boundaries into continuation fields, nothing is dropped.
+    """
+    embeds, page, size = [], [], reserved
+    for name, value in section_fields((name, value.split('\n')) for name, value in fields):
+        name, value = name[:EMBED_MAX_NAME_SIZE] or '\u200b', value or '\u200b'  # no empty
+        if page and (len(page) == EMBED_MAX_FIELDS or size + len(name) + len(value) > EMBED_MAX_SIZE):
+            embeds.append(page)
+            page, size = [], reserved
+        page.append((name, value))
+        size += len(name) + len(value)
+    if page:
+        embeds.append(page)
+    return embeds
+
+
+def build_embeds(sections: Iterable[section_type], color: int) -> List[discord.Embed]:
+    footer = PROJECT_INFORMATION['footer']
+    pages = pack_fields(section_fields(sections), reserved=len(footer) + len(' • Page 9999/9999'))
+    embeds = []
+    for number, fields in enumerate(pages, 1):
+        embed = discord.Embed(color=color)
+        for name, value in fields:
+            embed.add_field(name=name, value=value, inline=False)
+        embed.set_footer(text=footer if len(pages) == 1 else f'{footer} • Page {number}/{len(pages)}')
+        embeds.append(embed)
+    return embeds
+
+
+class PagedMessage:
+
+    def __init__(self, pages: List[discord.Embed], timeout: float):
+        self.pages = pages
+        self.index = 0
+        self.expires_at = time.monotonic() + timeout
+
+
+class Paginator:
+
+    def __init__(self, max_messages: int = PAGINATOR_MAX_MESSAGES, timeout: float = PAGINATOR_TIMEOUT):
+        """ Send embeds, an output longer than max_messages is posted as one message browsed with reactions """
+        self.max_messages = max_messages
+        self.timeout = timeout
+        self.messages: Dict[int, PagedMessage] = {}  # discord message id -> pages
+
+    async def send(self, channel: TextChannel, sections: Iterable[section_type], color: int) -> None:
+        embeds = build_embeds(sections, color)
+        if len(embeds) <= self.max_messages:
+            for embed in embeds:
+                await send_queue.send(channel, embed=embed)
+            return
+        sent = await send_queue.send(channel, embed=embeds[0])
+        asyncio.ensure_future(self.attach(sent, embeds))
+
+    async def attach(self, sent: asyncio.Future, pages: List[discord.Embed]) -> None:
+        message = await sent
+        if message is None:
+            return
+        now = time.monotonic()
+        self.messages = {id_message: paged for id_message, paged in self.messages.items() if paged.expires_at > now}
+        self.messages[message.id] = PagedMessage(pages, self.timeout)
+        try:
+            for emoji in (PREVIOUS_PAGE, NEXT_PAGE):
+                await message.add_reaction(emoji)
+        except discord.DiscordException as exception:
+            red(f'Cannot add page reactions in {message.channel}: {exception!r}')
+
+    async def on_reaction(self, reaction: discord.Reaction, user: discord.abc.User) -> None:
+        paged = self.messages.get(reaction.message.id)
+        step = {PREVIOUS_PAGE: -1, NEXT_PAGE: 1}.get(str(reaction.emoji))
+        if user.bot or paged is None or step is None or paged.expires_at < time.monotonic():
+            return
+        paged.index = (paged.index + step) % len(paged.pages)
+        try:
+            await reaction.message.edit(embed=paged.pages[paged.index])
+            await reaction.remove(user)  # lets the user click again, needs the manage messages permission
+        except discord.Forbidden:
+            pass
+        except discord.DiscordException as exception:
+            red(f'Cannot change page in {reaction.message.channel}: {exception!r}')
+
+
+paginator = Paginator()
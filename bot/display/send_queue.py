@@ -0,0 +1,106 @@
+import asyncio
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+import aiohttp
+import discord
+from discord.channel import TextChannel
+
+from bot.api.rate_limit import backoff_delay
+from bot.colors import red, yellow
+from bot.constants import SEND_MAX_RETRIES, SEND_QUEUE_MAX_DEPTH, SEND_WORKERS
+
+message_type = Tuple[TextChannel, Dict[str, Any], asyncio.Future]
+
+
+def is_transient(exception: Exception) -> bool:
+    if isinstance(exception, discord.HTTPException):
+        return exception.status >= 500 or exception.status == 429
+    return isinstance(exception, (asyncio.TimeoutError, aiohttp.ClientError, OSError))
+
+
+class SendQueue:
+
+    def __init__(self, workers: int = SEND_WORKERS, max_depth: int = SEND_QUEUE_MAX_DEPTH,
+                 max_retries: int = SEND_MAX_RETRIES):
+        """ Outbound Discord messages: one FIFO queue per channel drained by a pool of workers
+
+        A channel is handled by one worker at a time so its messages keep their order, while other channels
+        are sent in parallel. Producers wait when a channel already has max_depth messages queued.
+        """
+        self.worker_count = workers
+        self.max_depth = max_depth
+        self.max_retries = max_retries
+        self.queues: Dict[int, Deque[message_type]] = {}  # channel id -> messages
+        self.slots: Dict[int, asyncio.Semaphore] = {}  # channel id -> free places in its queue
+        self.scheduled: Set[int] = set()  # channels waiting in ready or being sent by a worker
+        self.ready: Optional[asyncio.Queue] = None
+        self.workers: List[asyncio.Future] = []
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+
+    def start(self) -> None:
+        if self.ready is None:
+            self.ready = asyncio.Queue()
+        while len(self.workers) < self.worker_count:
+            self.workers.append(asyncio.ensure_future(self.work()))
+
+    async def send(self, channel: TextChannel, **kwargs) -> asyncio.Future:
+        """ Queue channel.send(**kwargs), the returned future resolves to the Message (None if it failed) """
+        self.start()
+        slots = self.slots.get(channel.id)
+        if slots is None:
+            slots = self.slots[channel.id] = asyncio.Semaphore(self.max_depth)
+        if slots.locked():
+            yellow(f'Send queue of {channel} is full ({self.max_depth} messages), waiting')
+        await slots.acquire()
+        future = asyncio.get_event_loop().create_future()
+        self.queues.setdefault(channel.id, deque()).append((channel, kwargs, future))
+        if channel.id not in self.scheduled:
+            self.scheduled.add(channel.id)
+            self.ready.put_nowait(channel.id)
+        return future
+
+    async def deliver(self, channel: TextChannel, kwargs: Dict[str, Any]) -> Optional[discord.Message]:
+        for attempt in range(self.max_retries):
+            try:
+                return await channel.send(**kwargs)
+            except Exception as exception:
+                if not is_transient(exception) or attempt + 1 == self.max_retries:
+                    red(f'Cannot send message to {channel}: {exception!r}')
+                    self.failed += 1
+                    return None
+                self.retried += 1
+                await asyncio.sleep(backoff_delay(attempt))
+
+    async def work(self) -> None:
+        while True:
+            id_channel = await self.ready.get()
+            queue = self.queues[id_channel]
+            channel, kwargs, future = queue.popleft()
+            try:
+                message = await self.deliver(channel, kwargs)
+            finally:
+                self.slots[id_channel].release()
+                if queue:  # back at the end of the line, channels are served round-robin
+                    self.ready.put_nowait(id_channel)
+                else:
+                    self.scheduled.discard(id_channel)
+            if message is not None:
+                self.sent += 1
+            if not future.done():
+                future.set_result(message)
+
+    def stats(self) -> Dict[str, int]:
+        depths = [len(queue) for queue in self.queues.values()]
+        return dict(queued=sum(depths), max_depth=max(depths, default=0), busy_channels=len(self.scheduled),
+                    sent=self.sent, failed=self.failed, retried=self.retried)
+
+    def cancel(self) -> None:
+        for worker in self.workers:
+            worker.cancel()
+        self.workers = []
+
+
+send_queue = SendQueue()
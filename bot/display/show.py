@@ -1,4 +1,5 @@
 from datetime import datetime, timedelta
+import re
 import time
 from datetime import datetime, timedelta
 from html import unescape
@@ -9,29 +10,22 @@ from discord.ext.commands.bot import Bot
 from discord.ext.commands.context import Context
 
 import bot.manage.channel_data as channel_data
-from bot.api.fetch import search_rootme_user, get_solved_challenges, get_diff, get_all_challenges
+from bot.api.catalog import catalog
+from bot.api.fetch import search_rootme_user, get_solved_challenges, get_diff, solves_by_date
+from bot.api.mirror import mirror
 from bot.api.parser import Parser
+from bot.api.solve_matrix import solve_matrix
 from bot.colors import green
-from bot.constants import LANGS, emoji2, emoji3, emoji5, limit_size, medals
+from bot.concurrency import map_concurrently
+from bot.constants import LANGS, SCOREBOARD_PAGE_SIZE, SINCE_MAX_DAYS, emoji2, emoji3, emoji5, medals
 from bot.database.manager import DatabaseManager
+from bot.display.solve_rollups import solve_rollups
+from bot.display.solve_tracker import solve_tracker
 from bot.display.update import add_emoji
 from bot.wraps import stop_if_args_none
 
 challenges_type = Optional[Dict[str, Union[str, int, List[str]]]]
-all_challenges = {}  #  all challenges by discord_server
-
-
-def display_parts(message: str) -> List[str]:
-    message = message.split('\n')
-    tosend = ''
-    stored = []
-    for part in message:
-        if len(tosend + part + '\n') >= limit_size:
-            stored.append(tosend)
-            tosend = ''
-        tosend += part + '\n'
-    stored.append(tosend)
-    return stored
+announced_versions = {}  #  last catalog version announced by discord_server
 
 
 async def display_add_user(db: DatabaseManager, id_discord_server: int, bot: Bot, name: str) -> str:
@@ -76,16 +70,18 @@ async def display_remove_user(db: DatabaseManager, id_discord_server: int, bot:
         return add_emoji(bot, f'User {name} successfully removed from team', emoji2)
 
 
-async def display_scoreboard(db: DatabaseManager, id_discord_server: int) -> str:
+async def display_scoreboard(db: DatabaseManager, id_discord_server: int, page: int = 1) -> str:
+    board = await db.leaderboard(id_discord_server)
+    tosend = board.rendered.get((page, SCOREBOARD_PAGE_SIZE))
+    if tosend is not None:  # ranking did not change since last render
+        return tosend
     tosend = ''
-    users = await db.select_users(id_discord_server)
-    users = sorted(users, key=lambda x: x['score'], reverse=True)
-    for rank, user in enumerate(users):
-        username, score = user['rootme_username'], user['score']
-        if rank < len(medals):
-            tosend += f'{medals[rank]} {username} --> Score = {score} \n'
+    for rank, username, score in board.page(page, SCOREBOARD_PAGE_SIZE):
+        if rank <= len(medals):
+            tosend += f'{medals[rank - 1]} {username} --> Score = {score} \n'
         else:
             tosend += f' • • • {username} --> Score = {score} \n'
+    board.rendered[(page, SCOREBOARD_PAGE_SIZE)] = tosend
     return tosend
 
 
@@ -97,34 +93,31 @@ def user_has_solved(challenge_selected: str, solved_challenges: List[Dict[str, U
 async def display_who_solved(db: DatabaseManager, id_discord_server: int, challenge_title_query: str) \
         -> Tuple[Optional[str], Optional[str]]:
 
-    challenge_found = await Parser.find_challenge(challenge_title_query)
-    if not challenge_found:
+    challenges = catalog.search(challenge_title_query)
+    if not challenges:
         return f'Challenge "{challenge_title_query}" cannot be found in challenge list.', challenge_title_query
 
-    challenges = list(challenge_found[0].values())
     if len(challenges) > 1:
         tosend = f'Several challenges exists with the following challenge title query: "{challenge_title_query}"\n' \
             f'You might want to choose between these:\n'
         for challenge in challenges:
-            tosend += f'• {challenge["titre"]}\n'
+            tosend += f'• {unescape(challenge["titre"])}\n'
         return tosend, challenge_title_query
 
     tosend = ''
     rootme_challenge_selected = challenges[0]
     users = await db.select_users(id_discord_server)
     users = sorted(users, key=lambda x: x['score'], reverse=True)
+    await map_concurrently(mirror.get, [user['rootme_user_id'] for user in users])  # only fetched if not mirrored
+    team = [int(user['rootme_user_id']) for user in users]
+    solvers = set(solve_matrix.who_solved(rootme_challenge_selected["id_challenge"], team))
     for user in users:
-        user_info = await Parser.extract_rootme_profile_complete(user['rootme_user_id'])
-        if user_info is None:  #  User {user["rootme_username"]} score is equal to zero
-            continue
-        challenge_solved = user_info['validations']
-        challenge_solved_ids = [challenge['id_challenge'] for challenge in challenge_solved]
-        if rootme_challenge_selected['id_challenge'] not in challenge_solved_ids:
+        if int(user['rootme_user_id']) not in solvers:
             continue  # user did not solve selected_challenge
         tosend += f' • {user["rootme_username"]}\n'
     if not tosend:
-        tosend = f'Nobody solved "{rootme_challenge_selected["titre"]}".'
-    return tosend, rootme_challenge_selected["titre"]
+        tosend = f'Nobody solved "{unescape(rootme_challenge_selected["titre"])}".'
+    return tosend, unescape(rootme_challenge_selected["titre"])
 
 
 async def display_duration(db: DatabaseManager, context: Context, args: Tuple[str], delay: timedelta) \
@@ -141,24 +134,24 @@ async def display_duration(db: DatabaseManager, context: Context, args: Tuple[st
     else:
         users = await db.select_users(context.guild.id)
 
-    now = datetime.now()
-    tosend_list = []
-    for user in users:
-        user_info = await Parser.extract_rootme_profile_complete(user["rootme_user_id"])
-        if user_info is None:  #  User {user["rootme_username"]} score is equal to zero
+    missing = [user for user in users if not solve_rollups.is_indexed(context.guild.id, user['rootme_user_id'])]
+    if missing:  # not seen by the cron loop yet
+        users_info = await map_concurrently(mirror.get, [user['rootme_user_id'] for user in missing])
+        for user, user_info in zip(missing, users_info):
+            if user_info is not None:
+                solve_rollups.add(context.guild.id, user['rootme_user_id'], user_info['validations'])
+
+    solves = solve_rollups.since(context.guild.id, datetime.now() - delay)
+    id_challenges = list({solve.id_challenge for solve in solves})
+    challenges_info = dict(zip(id_challenges, await map_concurrently(catalog.get, id_challenges)))
+    tosend_by_user = {}
+    for solve in solves:
+        challenge_info = challenges_info[solve.id_challenge]
+        if challenge_info is None:
             continue
-        challenges_solved = user_info['validations']
-        challenges_solved = sorted(challenges_solved, key=lambda x: x['date'], reverse=True)
-
-        tosend = ''
-        for challenge in challenges_solved:
-            date = datetime.strptime(challenge['date'], "%Y-%m-%d %H:%M:%S")
-            diff = now - date
-            if diff >= delay:
-                continue
-            challenge_info = await Parser.extract_challenge_info(challenge['id_challenge'])
-            tosend += f' • {unescape(challenge_info["titre"])} ({challenge_info["score"]} points) - {challenge["date"]}\n'
-        tosend_list.append({'user': user, 'msg': tosend})
+        tosend_by_user[solve.id_user] = tosend_by_user.get(solve.id_user, '') + \
+            f' • {unescape(challenge_info["titre"])} ({challenge_info["score"]} points) - {solve.date}\n'
+    tosend_list = [{'user': user, 'msg': tosend_by_user.get(int(user['rootme_user_id']), '')} for user in users]
 
     test = [item['msg'] == '' for item in tosend_list]
     if len(users) == 1 and False not in test:
@@ -180,11 +173,22 @@ async def display_today(db: DatabaseManager, context: Context, args: Tuple[str])
     return await display_duration(db, context, args, timedelta(days=1))
 
 
+def parse_duration(text: str) -> Optional[timedelta]:
+    """ '12h', '3d' or '2w' to a timedelta, None if invalid """
+    match = re.fullmatch(r'(\d+)([hdw])', text.lower())
+    if match is None or int(match.group(1)) == 0:
+        return None
+    hours = int(match.group(1)) * {'h': 1, 'd': 24, 'w': 24 * 7}[match.group(2)]
+    return timedelta(hours=min(hours, SINCE_MAX_DAYS * 24))
+
+
 @stop_if_args_none
 async def display_diff_one_side(user_diff: List[Dict[str, str]]) -> str:
     tosend = ''
-    for challenge in user_diff:
-        challenge_info = await Parser.extract_challenge_info(challenge['id_challenge'])
+    challenges_info = await map_concurrently(catalog.get, [challenge['id_challenge'] for challenge in user_diff])
+    for challenge_info in challenges_info:
+        if challenge_info is None:
+            continue
         tosend += f' • {unescape(challenge_info["titre"])} ({challenge_info["score"]} points)\n'
     return tosend
 
@@ -203,12 +207,12 @@ async def display_diff(db: DatabaseManager, id_discord_server: int, username1: s
     database_users = await db.select_users(id_discord_server)
     user1 = db.find_user(database_users, id_discord_server, username1)
     user2 = db.find_user(database_users, id_discord_server, username2)
-    solved_user1 = await get_solved_challenges(user1['rootme_user_id'])
-    solved_user1 = sorted(solved_user1, key=lambda x: x['date'])  # sort challenge solved by date
-    solved_user2 = await get_solved_challenges(user2['rootme_user_id'])
-    solved_user2 = sorted(solved_user2, key=lambda x: x['date'])  # sort challenge solved by date
+    await map_concurrently(get_solved_challenges, [user1['rootme_user_id'], user2['rootme_user_id']])
 
-    user1_diff, user2_diff = get_diff(solved_user1, solved_user2)
+    user1_diff, user2_diff = get_diff(user1['rootme_user_id'], user2['rootme_user_id'])
+    if not user1_diff and not user2_diff:
+        tosend = f'{username1} and {username2} solved the same challenges.'
+        return [{'user': f'{username1} and {username2}', 'msg': tosend}]
     tosend_list = []
 
     tosend = await display_diff_one_side(user1_diff)
@@ -227,13 +231,14 @@ async def display_diff_with(db: DatabaseManager, id_discord_server: int, bot: Bo
     tosend_list = []
     users = await db.select_users(id_discord_server)
     selected_user = db.find_user(users, id_discord_server, selected_username)
-    solved_user_select = await get_solved_challenges(selected_user['rootme_user_id'])
+    await map_concurrently(get_solved_challenges, [user['rootme_user_id'] for user in users])
 
+    team = [int(user['rootme_user_id']) for user in users]
+    team_diff = solve_matrix.diff_with_team(int(selected_user['rootme_user_id']), team)
     for user in users:
-        solved_user = await get_solved_challenges(user['rootme_user_id'])
-        user_diff, user_diff_select = get_diff(solved_user, solved_user_select)
+        user_diff = team_diff.get(int(user['rootme_user_id']))
         if user_diff:
-            tosend = await display_diff_one_side(user_diff)
+            tosend = await display_diff_one_side(solves_by_date(user['rootme_user_id'], user_diff))
             tosend_list.append({'user': user["rootme_username"], 'msg': tosend})
     return tosend_list
 
@@ -247,77 +252,87 @@ async def display_flush(channel: TextChannel, context: Context) -> str:
 
 async def display_reset_database(db: DatabaseManager, id_discord_server: int, bot: Bot) -> str:
     """ Reset discord database """
-    users = await db.select_users(id_discord_server)
-    usernames = [user['rootme_username'] for user in users]
-    for name in usernames:
-        await db.delete_user(id_discord_server, name)
+    await db.delete_users(id_discord_server)
     return add_emoji(bot, f'Database has been successfully reset', emoji2)
 
 
 async def display_cron(id_discord_server: int, db: DatabaseManager) -> List[Tuple[Optional[str], Optional[str]]]:
     # check updates about challenges data
-    global all_challenges
-    
-    new_list_all_challenges = await get_all_challenges()
-    if id_discord_server not in list(all_challenges.keys()):
-        all_challenges[id_discord_server] = new_list_all_challenges
-
-    list_all_challenges = all_challenges[id_discord_server]
-
-    if len(new_list_all_challenges) > len(list_all_challenges):
-        challenges = [chall for chall in new_list_all_challenges if chall not in list_all_challenges]
-        message_title = f'NEW CHALLENGE !!!'
-        tosend = f''
-        for challenge in challenges:
-            print(challenge)
-            tosend += f' • {unescape(challenge["titre"])}'
-            """
-            challenge_info = await Parser.extract_challenge_info(challenge['id_challenge'])
-            tosend += f' • {challenge_info["titre"]} ({challenge_info["score"]} points)'
-            tosend += f'\n --> Category: {challenge_info["rubrique"]}'
-            #  tosend += f'\n • URL: {challenge_info["url_challenge"]}'
-            tosend += f'\n --> Difficulty: {challenge_info["difficulte"]}\n'
-            """
-        # update challenges list
-        all_challenges[id_discord_server] = new_list_all_challenges
-        return [(message_title, tosend)]
-    
+    if catalog.polled:  # new challenges are detected once per interval by the global catalog poller
+        if id_discord_server not in announced_versions:
+            announced_versions[id_discord_server] = catalog.version
+
+        challenges = catalog.listed_since(announced_versions[id_discord_server])
+        if challenges:
+            message_title = f'NEW CHALLENGE !!!'
+            tosend = f''
+            for challenge in challenges:
+                print(challenge)
+                tosend += f' • {unescape(challenge["titre"])}'
+                """
+                challenge_info = await Parser.extract_challenge_info(challenge['id_challenge'])
+                tosend += f' • {challenge_info["titre"]} ({challenge_info["score"]} points)'
+                tosend += f'\n --> Category: {challenge_info["rubrique"]}'
+                #  tosend += f'\n • URL: {challenge_info["url_challenge"]}'
+                tosend += f'\n --> Difficulty: {challenge_info["difficulte"]}\n'
+                """
+            # update guild cursor
+            announced_versions[id_discord_server] = catalog.version
+            return [(message_title, tosend)]
+
     messages = []
+    updated_users = []
+    board = await db.leaderboard(id_discord_server)  # loaded before scores change to follow rank changes
     # check updates about user data
     users = await db.select_users(id_discord_server)
+    solve_tracker.retain(id_discord_server, [user['rootme_user_id'] for user in users])
+    solve_rollups.retain(id_discord_server, [user['rootme_user_id'] for user in users])
     for user in users:
         print(user)
         number_challenge_solved, score = user['number_challenge_solved'], user['score']
-        user_data = await Parser.extract_rootme_profile_complete(user['rootme_user_id'])
+        user_data = mirror.profiles.get(int(user['rootme_user_id']))  # polled once for all guilds
         if user_data is None:  #  User {user["rootme_username"]} score is equal to zero
             continue
-        if len(user_data['validations']) == number_challenge_solved:
-            continue
-
-        if number_challenge_solved > 0:
-            new_challenges_solved = user_data['validations'][:-number_challenge_solved][::-1]  # last solved + reverse order
+        if solve_tracker.is_checked(id_discord_server, user['rootme_user_id'], user_data['validations']):
+            continue  # profile not fetched again since the last tick
+        new_challenges_solved = solve_tracker.new_solves(id_discord_server, user['rootme_user_id'],
+                                                         user_data['validations'], number_challenge_solved)
+        if solve_rollups.is_indexed(id_discord_server, user['rootme_user_id']):
+            solve_rollups.add(id_discord_server, user['rootme_user_id'], new_challenges_solved)
         else:
-            new_challenges_solved = user_data['validations'][::-1]  # all solves because there was no solve before + reverse
-        
-        for new_challenge in new_challenges_solved:
-            challenge_info = await Parser.extract_challenge_info(new_challenge['id_challenge'])
-            if challenge_info is None:
-                continue
-            score += int(challenge_info["score"])
-            green(f'{user["rootme_username"]} --> {unescape(challenge_info["titre"])}')
-            message_title = f'New challenge solved by {user["rootme_username"]}'
-            tosend = f' • {unescape(challenge_info["titre"])} ({challenge_info["score"]} points)'
-            tosend += f'\n • Category: {challenge_info["rubrique"]}'
-            #  tosend += f'\n • URL: {challenge_info["url_challenge"]}'
-            tosend += f'\n • Difficulty: {challenge_info["difficulte"]}'
-            tosend += f'\n • Date: {new_challenge["date"]}'
-            tosend += f'\n • New score: {score}'
-            messages.append((message_title, tosend))
-        
-        score = int(user_data["score"])
-        number_challenge_solved = len(user_data["validations"])
-        await db.update_user_info(id_discord_server, user['rootme_username'], score, number_challenge_solved)
-
+            solve_rollups.add(id_discord_server, user['rootme_user_id'], user_data['validations'])
+        if new_challenges_solved:
+            challenges_info = await map_concurrently(catalog.get, [new_challenge['id_challenge'] for new_challenge
+                                                                   in new_challenges_solved])
+            for new_challenge, challenge_info in zip(new_challenges_solved, challenges_info):
+                if challenge_info is None:
+                    continue
+                score += int(challenge_info["score"])
+                green(f'{user["rootme_username"]} --> {unescape(challenge_info["titre"])}')
+                message_title = f'New challenge solved by {user["rootme_username"]}'
+                tosend = f' • {unescape(challenge_info["titre"])} ({challenge_info["score"]} points)'
+                tosend += f'\n • Category: {challenge_info["rubrique"]}'
+                #  tosend += f'\n • URL: {challenge_info["url_challenge"]}'
+                tosend += f'\n • Difficulty: {challenge_info["difficulte"]}'
+                tosend += f'\n • Date: {new_challenge["date"]}'
+                tosend += f'\n • New score: {score}'
+                messages.append((message_title, tosend))
+
+        # score and count come from the fetched profile, whatever the order or removals of its validations
+        if int(user_data['score']) != int(user['score']) or len(user_data['validations']) != number_challenge_solved:
+            updated_users.append(dict(rootme_username=user['rootme_username'], score=int(user_data["score"]),
+                                      number_challenge_solved=len(user_data["validations"])))
+
+    if updated_users:
+        await db.update_users_info(id_discord_server, updated_users)  # one write for the whole tick
+
+    overtaken_by = {}
+    for username, overtaken in board.pop_overtakes():
+        overtaken_by.setdefault(username, []).append(overtaken)
+    for username, overtaken in overtaken_by.items():
+        tosend = f' • {username} overtook {", ".join(overtaken)}'
+        tosend += f'\n • New rank: {board.rank(username)}/{len(board)}'
+        messages.append(('Scoreboard update', tosend))
     return messages
 
 
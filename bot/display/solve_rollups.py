@@ -0,0 +1,90 @@
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set
+
+validation_type = Dict[str, Any]
+
+
+class Solve(NamedTuple):
+    solved_at: datetime
+    id_user: int
+    id_challenge: str
+    date: str
+
+
+class GuildRollup:
+
+    def __init__(self):
+        """ Solves of one discord server bucketed by hour and by day, timestamps are parsed once """
+        self.hours: Dict[int, List[Solve]] = {}  # day ordinal * 24 + hour -> solves
+        self.days: Dict[int, List[Solve]] = {}  # day ordinal -> solves
+        self.known: Dict[int, Set[str]] = {}  # rootme user id -> indexed challenge ids
+
+    def add(self, id_user: int, validations: Iterable[validation_type]) -> None:
+        known = self.known.setdefault(id_user, set())
+        for validation in validations:
+            id_challenge = str(validation['id_challenge'])
+            if id_challenge in known:
+                continue
+            known.add(id_challenge)
+            solved_at = datetime.strptime(validation['date'], "%Y-%m-%d %H:%M:%S")
+            solve = Solve(solved_at, id_user, id_challenge, validation['date'])
+            day = solved_at.toordinal()
+            self.days.setdefault(day, []).append(solve)
+            self.hours.setdefault(day * 24 + solved_at.hour, []).append(solve)
+
+    def remove_users(self, id_users: Set[int]) -> None:
+        for buckets in (self.hours, self.days):
+            for key in list(buckets):
+                buckets[key] = [solve for solve in buckets[key] if solve.id_user not in id_users]
+                if not buckets[key]:
+                    del buckets[key]
+        for id_user in id_users:
+            self.known.pop(id_user, None)
+
+    def hours_range(self, day: int, first: int, last: int) -> List[Solve]:
+        return [solve for hour in range(day * 24 + first, day * 24 + last + 1) for solve in self.hours.get(hour, [])]
+
+    def between(self, start: datetime, end: datetime) -> List[Solve]:
+        """ Solves in [start, end], newest first: whole days in the middle, hours at both edges """
+        first_day, last_day = start.toordinal(), end.toordinal()
+        if first_day == last_day:
+            solves = self.hours_range(first_day, start.hour, end.hour)
+        else:
+            solves = self.hours_range(first_day, start.hour, 23)
+            for day in range(first_day + 1, last_day):
+                solves += self.days.get(day, [])
+            solves += self.hours_range(last_day, 0, end.hour)
+        solves = [solve for solve in solves if start <= solve.solved_at <= end]  # edge hours are partial
+        return sorted(solves, key=lambda solve: solve.solved_at, reverse=True)
+
+
+class SolveRollups:
+
+    def __init__(self):
+        """ Per discord server solve rollups, fed by the cron loop as solves are detected """
+        self.guilds: Dict[int, GuildRollup] = {}
+
+    def guild(self, id_discord_server: int) -> GuildRollup:
+        rollup = self.guilds.get(id_discord_server)
+        if rollup is None:
+            rollup = self.guilds[id_discord_server] = GuildRollup()
+        return rollup
+
+    def is_indexed(self, id_discord_server: int, id_user: int) -> bool:
+        return int(id_user) in self.guild(id_discord_server).known
+
+    def add(self, id_discord_server: int, id_user: int, validations: Iterable[validation_type]) -> None:
+        self.guild(id_discord_server).add(int(id_user), validations)
+
+    def retain(self, id_discord_server: int, id_users: Iterable[int]) -> None:
+        """ Drop solves of users removed from a server """
+        rollup = self.guild(id_discord_server)
+        removed = set(rollup.known) - {int(id_user) for id_user in id_users}
+        if removed:
+            rollup.remove_users(removed)
+
+    def since(self, id_discord_server: int, start: datetime, end: Optional[datetime] = None) -> List[Solve]:
+        return self.guild(id_discord_server).between(start, datetime.now() if end is None else end)
+
+
+solve_rollups = SolveRollups()
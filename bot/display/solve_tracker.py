@@ -0,0 +1,51 @@
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+validation_type = Dict[str, Any]
+user_key = Tuple[int, int]  # (discord server id, rootme user id)
+
+
+class SolveTracker:
+
+    def __init__(self):
+        """ Challenges already announced for each tracked user of each discord server
+
+        New solves are the difference between the fetched and the known challenge ids, so the order of the
+        validations returned by the API does not matter.
+        """
+        self.known: Dict[user_key, Set[str]] = {}
+        self.checked: Dict[user_key, List[validation_type]] = {}  # validations list of the last check
+
+    def seed(self, key: user_key, validations: List[validation_type], number_challenge_solved: int) -> None:
+        """ First time a user is seen (startup, new user): its stored count of solves was already announced
+
+        The oldest validations by date are taken as known, which does not rely on the order of the API answer.
+        """
+        announced = sorted(validations, key=lambda validation: validation['date'])[:number_challenge_solved]
+        self.known[key] = {str(validation['id_challenge']) for validation in announced}
+
+    def is_checked(self, id_discord_server: int, id_user: int, validations: List[validation_type]) -> bool:
+        """ True if this mirrored list was already diffed for this server, the mirror replaces it on each fetch """
+        return self.checked.get((id_discord_server, int(id_user))) is validations
+
+    def new_solves(self, id_discord_server: int, id_user: int, validations: List[validation_type],
+                   number_challenge_solved: int) -> List[validation_type]:
+        """ Validations not announced yet in this server, oldest first """
+        key = (id_discord_server, int(id_user))
+        if key not in self.known:
+            self.seed(key, validations, number_challenge_solved)
+        fetched = {str(validation['id_challenge']): validation for validation in validations}
+        new_validations = sorted((fetched[id_challenge] for id_challenge in fetched.keys() - self.known[key]),
+                                 key=lambda validation: validation['date'])
+        self.known[key] = set(fetched)
+        self.checked[key] = validations
+        return new_validations
+
+    def retain(self, id_discord_server: int, id_users: Iterable[int]) -> None:
+        """ Forget users removed from a server, they are seeded again if they come back """
+        id_users = {int(id_user) for id_user in id_users}
+        for key in [key for key in self.known if key[0] == id_discord_server and key[1] not in id_users]:
+            del self.known[key]
+            self.checked.pop(key, None)
+
+
+solve_tracker = SolveTracker()
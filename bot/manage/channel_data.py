@@ -1,21 +1,86 @@
+from datetime import datetime, timedelta
+from typing import List
+
+import discord
 from discord.channel import TextChannel
 
+from bot.colors import red
+from bot.constants import BULK_DELETE_MAX_AGE, BULK_DELETE_SIZE, FLUSH_HISTORY_LIMIT
+
+
+def is_preserved(m: discord.Message, discord_timestamp: datetime) -> bool:
+    """ Events and a FLUSH message posted less than 30s before the newest one are kept """
+    if len(m.embeds) > 0 and hasattr(m.embeds[0], 'fields'):
+        embed_msg = m.embeds[0].fields[0]
+        title = embed_msg.name
+        duration = (discord_timestamp - m.created_at).seconds
+        if any('New challenge solved by' in field.name or 'Scoreboard update' in field.name
+               for field in m.embeds[0].fields):  # batched events
+            return True
+        elif 'FLUSH' in title and duration < 30:
+            return True
+    return False
+
+
+def own_messages(selected_channel: TextChannel, messages: List[discord.Message]) -> List[discord.Message]:
+    """ Messages posted by the bot, it can delete them without the manage messages permission """
+    return [m for m in messages if m.author.id == selected_channel.guild.me.id]
+
+
+async def delete_one_by_one(messages: List[discord.Message]) -> None:
+    for m in messages:
+        try:
+            await m.delete()
+        except discord.NotFound:  # already deleted
+            pass
+        except discord.Forbidden:  # message of another user and no manage messages permission
+            pass
+
 
-async def flush(selected_channel: TextChannel) -> bool:
+async def delete_bulk(selected_channel: TextChannel, messages: List[discord.Message]) -> bool:
+    """ One request for up to BULK_DELETE_SIZE messages, single deletes if Discord refuses the batch
+
+    Return False when the bot is not allowed to delete messages of other users, only its own were deleted.
+    """
+    try:
+        await selected_channel.delete_messages(messages)
+    except discord.Forbidden:
+        red(f'Missing manage messages permission in {selected_channel}, only bot messages are flushed')
+        await delete_one_by_one(own_messages(selected_channel, messages))
+        return False
+    except discord.HTTPException as exception:
+        red(f'Bulk delete of {len(messages)} messages failed in {selected_channel}: {exception!r}')
+        await delete_one_by_one(messages)
+    return True
+
+
+async def flush(selected_channel: TextChannel, limit: int = FLUSH_HISTORY_LIMIT) -> bool:
     discord_timestamp = None
-    async for m in selected_channel.history(limit=100):
-        if discord_timestamp is None:
-            discord_timestamp = m.created_at
-        if len(m.embeds) > 0 and hasattr(m.embeds[0], 'fields'):
-            embed_msg = m.embeds[0].fields[0]
-            title = embed_msg.name
-            duration = (discord_timestamp - m.created_at).seconds
-            if 'New challenge solved by' in title:
-                pass
-            elif 'FLUSH' in title and duration < 30:
-                pass
+    bulk_after = datetime.utcnow() - timedelta(seconds=BULK_DELETE_MAX_AGE)  # older messages cannot be bulk deleted
+    recent, old = [], []
+    can_bulk_delete = True
+    try:
+        async for m in selected_channel.history(limit=limit):
+            if discord_timestamp is None:
+                discord_timestamp = m.created_at
+            if is_preserved(m, discord_timestamp):
+                continue
+            if m.created_at > bulk_after:
+                recent.append(m)
+                if len(recent) == BULK_DELETE_SIZE:
+                    if can_bulk_delete:
+                        can_bulk_delete = await delete_bulk(selected_channel, recent)
+                    else:
+                        await delete_one_by_one(own_messages(selected_channel, recent))
+                    recent = []
             else:
-                await m.delete()
-        else:
-            await m.delete()
+                old.append(m)
+        if recent and can_bulk_delete:
+            can_bulk_delete = await delete_bulk(selected_channel, recent)
+        elif recent:
+            await delete_one_by_one(own_messages(selected_channel, recent))
+        await delete_one_by_one(old if can_bulk_delete else own_messages(selected_channel, old))
+    except discord.HTTPException as exception:
+        red(f'Cannot flush {selected_channel}: {exception!r}')
+        return False
     return True
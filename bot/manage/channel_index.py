@@ -0,0 +1,48 @@
+from typing import Dict, List, Tuple
+
+from discord.abc import GuildChannel
+from discord.guild import Guild
+
+
+class BotChannelIndex:
+
+    def __init__(self, channel_name: str):
+        """ Guild -> bot channels index, kept up to date by gateway events instead of scanning every tick """
+        self.channel_name = channel_name
+        self.channels: Dict[int, Dict[int, GuildChannel]] = {}  # guild id -> channel id -> channel
+
+    def __len__(self) -> int:
+        return len(self.channels)
+
+    def add_guild(self, guild: Guild) -> None:
+        self.channels.pop(guild.id, None)
+        for channel in guild.channels:
+            self.update_channel(channel)
+
+    def remove_guild(self, guild: Guild) -> None:
+        self.channels.pop(guild.id, None)
+
+    def rebuild(self, guilds: List[Guild]) -> None:
+        self.channels = {}
+        for guild in guilds:
+            self.add_guild(guild)
+
+    def update_channel(self, channel: GuildChannel) -> None:
+        """ Called on creation and update, a channel renamed from/to the bot channel name is removed/added """
+        if str(channel) == self.channel_name:
+            self.channels.setdefault(channel.guild.id, {})[channel.id] = channel
+        else:
+            self.remove_channel(channel)
+
+    def remove_channel(self, channel: GuildChannel) -> None:
+        guild_channels = self.channels.get(channel.guild.id)
+        if guild_channels is None:
+            return
+        guild_channels.pop(channel.id, None)
+        if not guild_channels:
+            del self.channels[channel.guild.id]
+
+    def items(self) -> List[Tuple[Guild, List[GuildChannel]]]:
+        """ (guild, bot channels) pairs, only for guilds that have a bot channel """
+        return [(next(iter(guild_channels.values())).guild, list(guild_channels.values()))
+                for guild_channels in self.channels.values()]
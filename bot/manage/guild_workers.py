@@ -0,0 +1,49 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable
+
+from bot.colors import red, yellow
+from bot.constants import GUILD_TICK_DEADLINE, GUILD_WORKER_TIMEOUT
+
+
+class GuildWorkers:
+
+    def __init__(self, deadline: float = GUILD_TICK_DEADLINE, timeout: float = GUILD_WORKER_TIMEOUT):
+        """ Run each guild's cron work in its own supervised task
+
+        A cron tick waits at most `deadline` seconds for the workers, a slower worker keeps running in the
+        background and its guild is skipped until it is done. A worker is cancelled after `timeout` seconds,
+        an exception in a worker is logged and never reaches the cron loop or the other guilds.
+        """
+        self.deadline = deadline
+        self.timeout = timeout
+        self.tasks: Dict[Hashable, asyncio.Future] = {}
+
+    async def supervise(self, key: Hashable, name: str, function: Callable[[], Awaitable[None]]) -> None:
+        try:
+            await asyncio.wait_for(function(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            red(f'Cron worker for "{name}" cancelled after {self.timeout}s')
+        except asyncio.CancelledError:
+            raise
+        except Exception as exception:
+            red(f'Cron worker for "{name}" crashed: {exception!r}')
+
+    def run(self, key: Hashable, name: str, function: Callable[[], Awaitable[None]]) -> bool:
+        """ Start a worker unless the previous one for the same key is still running """
+        task = self.tasks.get(key)
+        if task is not None and not task.done():
+            yellow(f'Cron worker for "{name}" is still running, skipping this tick')
+            return False
+        self.tasks[key] = asyncio.ensure_future(self.supervise(key, name, function))
+        return True
+
+    async def wait(self) -> None:
+        """ Wait for running workers, no longer than the tick deadline """
+        running = [task for task in self.tasks.values() if not task.done()]
+        if running:
+            await asyncio.wait(running, timeout=self.deadline)
+
+    def cancel(self) -> None:
+        for task in self.tasks.values():
+            task.cancel()
+        self.tasks = {}
@@ -1,20 +1,35 @@
 import asyncio
 import sys
+from functools import partial
 from os import environ
+from typing import Dict, List, Optional
 
+from discord import Reaction
+from discord.abc import GuildChannel, User
 from discord.ext import commands
+from discord.guild import Guild
 from dotenv import load_dotenv
 
 import bot.display.embed as disp
-from bot.api.fetch import get_challenges
+from bot.api.catalog import catalog
+from bot.api.fetch import get_challenges, poll_users
+from bot.api.scheduler import poll_scheduler
+from bot.api.session import session_manager
 from bot.colors import green, red
-from bot.constants import LANGS, FILENAME
+from bot.constants import LANGS, FILENAME, SQLITE_FILENAME
 from bot.database.manager import DatabaseManager
+from bot.database.sqlite_manager import SQLiteDatabaseManager
+from bot.display.events import solve_events
+from bot.display.paginator import paginator
+from bot.display.send_queue import send_queue
+from bot.manage.channel_index import BotChannelIndex
+from bot.manage.guild_workers import GuildWorkers
 from bot.wraps import update_challenges
 
 load_dotenv()
 TOKEN = environ.get('TOKEN')
 BOT_CHANNEL = environ.get('BOT_CHANNEL')
+DATABASE_BACKEND = environ.get('DATABASE_BACKEND', 'json')  # json | sqlite
 
 
 class RootMeBot:
@@ -23,14 +38,19 @@ class RootMeBot:
         """ Discord Bot to catch RootMe events made by zTeeed """
         self.db = db
         self.bot = commands.Bot(command_prefix='!')
+        self.workers = GuildWorkers()
+        self.channel_index = BotChannelIndex(BOT_CHANNEL)
 
     async def cron(self):
         await self.bot.wait_until_ready()
         while not self.bot.is_closed():
-            for server in self.bot.guilds:  # loop over servers where bot is currently active
-                for channel in server.channels:
-                    if str(channel) == BOT_CHANNEL:  # send data only in the right channel
-                        await disp.cron(channel, server, self.db, self.bot)
+            bot_channels = self.channel_index.items()  # send data only in the right channel
+            id_users = await self.db.select_rootme_user_ids([server.id for server, channels in bot_channels])
+            poll_scheduler.sync(id_users)
+            await poll_users(poll_scheduler.due())  # each due RootMe account is fetched once for all servers
+            for server, channels in bot_channels:  # one isolated worker per server, for all its bot channels
+                self.workers.run(server.id, server.name, partial(disp.cron, channels, server, self.db, self.bot))
+            await self.workers.wait()
             await asyncio.sleep(1)
 
     def catch(self):
@@ -38,6 +58,31 @@ class RootMeBot:
         async def on_ready():
             for server in self.bot.guilds:
                 green(f'RootMeBot is starting on the following server: "{server.name}" !')
+            self.channel_index.rebuild(self.bot.guilds)
+
+        @self.bot.event
+        async def on_guild_join(server: Guild):
+            self.channel_index.add_guild(server)
+
+        @self.bot.event
+        async def on_guild_remove(server: Guild):
+            self.channel_index.remove_guild(server)
+
+        @self.bot.event
+        async def on_guild_channel_create(channel: GuildChannel):
+            self.channel_index.update_channel(channel)
+
+        @self.bot.event
+        async def on_guild_channel_update(before: GuildChannel, after: GuildChannel):
+            self.channel_index.update_channel(after)
+
+        @self.bot.event
+        async def on_guild_channel_delete(channel: GuildChannel):
+            self.channel_index.remove_channel(channel)
+
+        @self.bot.event
+        async def on_reaction_add(reaction: Reaction, user: User):
+            await paginator.on_reaction(reaction, user)
 
         @self.bot.command(description='Show information about the project')
         async def info(context: commands.context.Context):
@@ -56,7 +101,7 @@ class RootMeBot:
 
         @self.bot.command(description='Show list of users from team.')
         async def scoreboard(context: commands.context.Context):
-            """ """
+            """ (<page>) """
             await disp.scoreboard(self.db, context)
 
         @self.bot.command(description='Return who solved a specific challenge.')
@@ -74,6 +119,11 @@ class RootMeBot:
             """ (<username>) """
             await disp.today(self.db, context)
 
+        @self.bot.command(description='Return challenges solved grouped by users for a custom duration (12h, 3d, 2w).')
+        async def since(context: commands.context.Context):
+            """ <duration> (<username>) """
+            await disp.since(self.db, context)
+
         @update_challenges
         @self.bot.command(description='Return difference of solved challenges between two users.')
         async def diff(context: commands.context.Context):
@@ -103,27 +153,63 @@ class RootMeBot:
 
     def start(self):
         self.catch()
-        self.bot.loop.create_task(self.cron())
-        self.bot.run(TOKEN)
-
-
-def init_rootme_challenges():
+        loop = self.bot.loop
+        loop.create_task(self.cron())
+        loop.create_task(catalog.poll_forever())
+        loop.create_task(self.db.compact_forever())
+        try:
+            loop.run_until_complete(self.bot.start(TOKEN))
+        except KeyboardInterrupt:
+            loop.run_until_complete(self.bot.logout())
+        finally:
+            self.workers.cancel()
+            solve_events.cancel()
+            send_queue.cancel()
+            loop.run_until_complete(self.db.close())
+            loop.run_until_complete(session_manager.close())
+            loop.close()
+
+
+async def fetch_rootme_challenges() -> Optional[List[Dict[str, str]]]:
+    results = await asyncio.gather(*[get_challenges(lang) for lang in LANGS])  # all languages at once
     rootme_challenges = []
-    for lang in LANGS:
-        loop = asyncio.get_event_loop()  # event loop
-        future = asyncio.ensure_future(get_challenges(lang))  # tasks to do
-        challenges = loop.run_until_complete(future)  # loop until done
-        challenges = challenges[0]
-        rootme_challenges += list(challenges.values())
+    for challenges in results:
+        if challenges is None:
+            continue
+        rootme_challenges += list(challenges[0].values())
+    if not rootme_challenges:
+        return None
     rootme_challenges = sorted(rootme_challenges, key=lambda x: int(x['id_challenge']))
+    catalog.load(rootme_challenges)
+    await catalog.save_snapshot()
     return rootme_challenges
 
 
+async def revalidate_rootme_challenges() -> None:
+    if await fetch_rootme_challenges() is None:
+        red('Cannot revalidate RootMe challenges snapshot, keeping it as is.')
+        return
+    green(f'RootMe challenges snapshot revalidated ({len(catalog)} challenges).')
+
+
+def init_rootme_challenges():
+    loop = asyncio.get_event_loop()  # event loop
+    loop.run_until_complete(session_manager.start())
+    if catalog.load_snapshot():  # start right away, the API is queried once the bot is running
+        green(f'RootMe challenges loaded from {catalog.snapshot_filename} ({len(catalog)} challenges).')
+        loop.create_task(revalidate_rootme_challenges())
+        return sorted(catalog.challenges.values(), key=lambda x: int(x['id_challenge']))
+    return loop.run_until_complete(fetch_rootme_challenges())
+
+
 if __name__ == "__main__":
     rootme_challenges = init_rootme_challenges()
     if rootme_challenges is None:
         red('Cannot fetch RootMe challenges from the API.')
         sys.exit(0)
-    db = DatabaseManager(FILENAME, rootme_challenges)
+    if DATABASE_BACKEND == 'sqlite':
+        db = SQLiteDatabaseManager(SQLITE_FILENAME, rootme_challenges)
+    else:
+        db = DatabaseManager(FILENAME, rootme_challenges)
     bot = RootMeBot(db)
     bot.start()